@@ -4,5 +4,8 @@ import profile
 import thermo
 import interp
 import winds
+import params
+import batch
 
-__all__ = ['contants', 'utils', 'profile', 'thermo', 'interp', 'winds']
\ No newline at end of file
+__all__ = ['contants', 'utils', 'profile', 'thermo', 'interp', 'winds']
+__all__ += ['params', 'batch']
\ No newline at end of file
@@ -0,0 +1,84 @@
+''' Numba-compiled kernels for the Thermodynamic Library '''
+from __future__ import division
+import math
+import numba
+import numpy as np
+from sharppy.sharptab.constants import ROCP, ZEROCNK
+
+
+__all__ = ['wobf', 'satlift', 'vappres', 'mixratio', 'lcltemp']
+
+
+@numba.njit(cache=True)
+def _wobf(t):
+    t = t - 20
+    if t <= 0:
+        npol = 1 + t * (-8.841660499999999e-3 + t * ( 1.4714143e-4
+               + t * (-9.671989000000001e-7 + t * (-3.2607217e-8
+               + t * (-3.8598073e-10)))))
+        return 15.13 / (npol**4)
+    ppol = t * (4.9618922e-07 + t * (-6.1059365e-09 +
+          t * (3.9401551e-11 + t * (-1.2588129e-13 +
+          t * (1.6688280e-16)))))
+    ppol = 1 + t * (3.6182989e-03 + t * (-1.3603273e-05 + ppol))
+    return (29.93 / (ppol**4)) + (0.96 * t) - 14.8
+
+
+@numba.njit(cache=True)
+def _satlift(p, thetam):
+    if math.isnan(p) or math.isinf(p) or math.isnan(thetam) or \
+            math.isinf(thetam):
+        return np.nan
+    if math.fabs(p - 1000.) - 0.001 <= 0: return thetam
+    pwrp = (p / 1000.)**ROCP
+    t1 = (thetam + ZEROCNK) * pwrp - ZEROCNK
+    e1 = _wobf(t1) - _wobf(thetam)
+    rate = 1.
+    t2 = t1 - (e1 * rate)
+    e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+    e2 += _wobf(t2) - _wobf(e2) - thetam
+    eor = e2 * rate
+    while math.fabs(eor) - 0.1 > 0:
+        rate = (t2 - t1) / (e2 - e1)
+        t1 = t2
+        e1 = e2
+        t2 = t1 - (e1 * rate)
+        e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+        e2 += _wobf(t2) - _wobf(e2) - thetam
+        eor = e2 * rate
+    return t2 - eor
+
+
+@numba.njit(cache=True)
+def _vappres(t):
+    pol = t * (1.1112018e-17 + (t * -3.0994571e-20))
+    pol = t * (2.1874425e-13 + (t * (-1.789232e-15 + pol)))
+    pol = t * (4.3884180e-09 + (t * (-2.988388e-11 + pol)))
+    pol = t * (7.8736169e-05 + (t * (-6.111796e-07 + pol)))
+    pol = 0.99999683 + (t * (-9.082695e-03 + pol))
+    return 6.1078 / pol**8
+
+
+@numba.njit(cache=True)
+def _mixratio(p, t):
+    x = 0.02 * (t - 12.5 + (7500. / p))
+    wfw = 1. + (0.0000045 * p) + (0.0014 * x * x)
+    fwesw = wfw * _vappres(t)
+    return 621.97 * (fwesw / (p - fwesw))
+
+
+@numba.njit(cache=True)
+def _lcltemp(t, td):
+    s = t - td
+    dlt = s * (1.2185 + 0.001278 * t + s * (-0.00219 + 1.173e-5 * s -
+        0.0000052 * t))
+    return t - dlt
+
+
+_unary = numba.vectorize(['float64(float64)'], cache=True)
+_binary = numba.vectorize(['float64(float64, float64)'], cache=True)
+wobf = _unary(_wobf)
+satlift = _binary(_satlift)
+vappres = _unary(_vappres)
+mixratio = _binary(_mixratio)
+lcltemp = _binary(_lcltemp)
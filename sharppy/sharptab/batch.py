@@ -0,0 +1,681 @@
+''' Routines for Many Soundings at Once (ProfileBatch) '''
+from __future__ import division
+import numpy as np
+from sharppy.sharptab import thermo, interp, utils, winds
+from sharppy.sharptab.constants import *
+
+
+__all__ = ['pres', 'hght', 'temp', 'dwpt', 'vtmp', 'components']
+__all__ += ['to_agl', 'to_msl', 'wind_shear', 'layer_index', 'layer_mean']
+__all__ += ['mean_wind', 'mean_wind_npw', 'non_parcel_bunkers_motion']
+__all__ += ['max_wind', 'wind_shear_layers']
+
+
+def pres(batch, h):
+    '''
+    Interpolates the given data to calculate a pressure at a given height
+    in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    h : number, numpy array
+        Height (m) of the level for which pressure is desired. A number
+        is used for every profile, a 1D array gives one height per profile
+        and a 2D array of shape (profiles, levels) gives several heights
+        per profile.
+
+    Returns
+    -------
+    Pressure (hPa) at the given height(s); NaN outside of the data
+
+    '''
+    return 10**_interp(batch, h, ('logp',), 'hght')[0]
+
+
+def hght(batch, p):
+    '''
+    Interpolates the given data to calculate a height at a given pressure
+    in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    p : number, numpy array
+        Pressure (hPa) of the level for which height is desired (see pres
+        for the accepted shapes)
+
+    Returns
+    -------
+    Height (m) at the given pressure(s); NaN outside of the data
+
+    '''
+    return _interp(batch, np.log10(p), ('hght',), 'logp')[0]
+
+
+def temp(batch, p):
+    '''
+    Interpolates the given data to calculate a temperature at a given
+    pressure in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    p : number, numpy array
+        Pressure (hPa) of the level for which temperature is desired (see
+        pres for the accepted shapes)
+
+    Returns
+    -------
+    Temperature (C) at the given pressure(s); NaN outside of the data
+
+    '''
+    return _interp(batch, np.log10(p), ('tmpc',), 'logp')[0]
+
+
+def dwpt(batch, p):
+    '''
+    Interpolates the given data to calculate a dew point temperature at a
+    given pressure in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    p : number, numpy array
+        Pressure (hPa) of the level for which dew point temperature is
+        desired (see pres for the accepted shapes)
+
+    Returns
+    -------
+    Dew point temperature (C) at the given pressure(s); NaN outside of the
+    data
+
+    '''
+    return _interp(batch, np.log10(p), ('dwpc',), 'logp')[0]
+
+
+def vtmp(batch, p):
+    '''
+    Interpolates the given data to calculate a virtual temperature at a
+    given pressure in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    p : number, numpy array
+        Pressure (hPa) of the level for which virtual temperature is
+        desired (see pres for the accepted shapes)
+
+    Returns
+    -------
+    Virtual temperature (C) at the given pressure(s); NaN outside of the
+    data
+
+    '''
+    p = np.asarray(p, dtype=np.float64)
+    t, td = _interp(batch, np.log10(p), ('tmpc', 'dwpc'), 'logp')
+    with np.errstate(invalid='ignore'):
+        return thermo.virtemp(p, t, td)
+
+
+def components(batch, p):
+    '''
+    Interpolates the given data to calculate the U and V components at a
+    given pressure in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    p : number, numpy array
+        Pressure (hPa) of the level for which the components are desired
+        (see pres for the accepted shapes)
+
+    Returns
+    -------
+    U and V components at the given pressure(s); NaN outside of the data
+
+    '''
+    u, v = _interp(batch, np.log10(p), ('u', 'v'), 'logp')
+    return u, v
+
+
+def to_agl(batch, h):
+    '''
+    Convert a height from mean sea-level (MSL) to above ground-level (AGL)
+    in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    h : number, numpy array
+        Height of a level (see pres for the accepted shapes)
+
+    Returns
+    -------
+    Converted height
+
+    '''
+    return h - _sfc_value(batch, 'hght', h)
+
+
+def to_msl(batch, h):
+    '''
+    Convert a height from above ground-level (AGL) to mean sea-level (MSL)
+    in every profile of the batch
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    h : number, numpy array
+        Height of a level (see pres for the accepted shapes)
+
+    Returns
+    -------
+    Converted height
+
+    '''
+    return h + _sfc_value(batch, 'hght', h)
+
+
+def wind_shear(batch, pbot=850, ptop=250):
+    '''
+    Calculates the shear between the wind at (pbot) and (ptop) in every
+    profile of the batch.
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    pbot : number, numpy array (optional; default 850 hPa)
+        Pressure of the bottom level (hPa), or one per profile
+    ptop : number, numpy array (optional; default 250 hPa)
+        Pressure of the top level (hPa), or one per profile
+
+    Returns
+    -------
+    shu : numpy array
+        U-component
+    shv : numpy array
+        V-component
+
+    '''
+    n = len(batch)
+    p = np.column_stack([np.broadcast_to(pbot, (n,)),
+                         np.broadcast_to(ptop, (n,))])
+    u, v = components(batch, p)
+    return u[:, 1] - u[:, 0], v[:, 1] - v[:, 0]
+
+
+def layer_index(batch, field):
+    '''
+    Builds the cumulative pressure integrals of a field over the native
+    levels of every profile so that layer means can be found with
+    layer_mean (see interp.layer_index). The index is cached on the batch.
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    field : string
+        Name of the batch attribute (e.g. 'u'), or of a derived field with
+        a get_<field>_profile method (e.g. 'vtmp')
+
+    Returns
+    -------
+    index : tuple of numpy arrays
+        Pressures, field values, slopes with respect to ln(p) and the
+        cumulative integrals of field dp and field p dp of each profile,
+        with the valid levels packed at the front of each row, followed by
+        the search index of those levels
+
+    '''
+    key = ('layer', field)
+    if key not in batch._cache:
+        getter = getattr(batch, 'get_%s_profile' % field, None)
+        f = getter() if getter is not None else getattr(batch, field)
+        ok = np.isfinite(batch.pres) & np.isfinite(f)
+        order, p, logp, dlogp, search = _layer_levels(batch, ok)
+        rows = np.arange(len(batch))[:, np.newaxis]
+        f = np.where(np.isnan(p), np.nan, f[rows, order])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dp = np.diff(p, axis=1)
+            slope = np.where(dlogp != 0, np.diff(f, axis=1) / dlogp, 0.)
+            # Same as interp._layer_partial from each level to the next,
+            # reusing the log pressures
+            p0 = p[:, :-1]
+            p1 = p[:, 1:]
+            f0 = f[:, :-1]
+            i0 = f0 * dp + slope * (p1 * dlogp - dp)
+            dp2 = p1**2 - p0**2
+            i1 = f0 * dp2 / 2. + slope * (p1**2 * dlogp / 2. - dp2 / 4.)
+        valid = np.isfinite(i0)
+        slope[~valid] = 0.
+        cum0 = np.zeros(p.shape)
+        cum1 = np.zeros(p.shape)
+        cum0[:, 1:] = np.cumsum(np.where(valid, i0, 0.), axis=1)
+        cum1[:, 1:] = np.cumsum(np.where(valid, i1, 0.), axis=1)
+        batch._cache[key] = (p, f, slope, cum0, cum1, search)
+    return batch._cache[key]
+
+
+def layer_mean(index, pbot, ptop, weighted=False):
+    '''
+    Returns the mean of a field through a layer of every profile using the
+    cumulative integrals from layer_index.
+
+    Parameters
+    ----------
+    index : tuple of numpy arrays
+        Cumulative integrals of the field from layer_index
+    pbot : number, numpy array
+        Pressure of the bottom level (hPa) (see pres for the accepted
+        shapes)
+    ptop : number, numpy array
+        Pressure of the top level (hPa)
+    weighted : bool (optional; default False)
+        Return the pressure-weighted mean instead of the mean with respect
+        to pressure
+
+    Returns
+    -------
+    Mean of the field through each layer (NaN for layers that extend
+    outside of the data)
+
+    '''
+    n = index[0].shape[0]
+    pbot = np.asarray(pbot, dtype=np.float64)
+    ptop = np.asarray(ptop, dtype=np.float64)
+    if pbot.ndim < 2 and ptop.ndim < 2:
+        pbot = np.broadcast_to(pbot, (n,))
+        ptop = np.broadcast_to(ptop, (n,))
+        p = np.column_stack([pbot, ptop])
+        (bot0, top0), (bot1, top1) = [i.T for i in _layer_integral(index, p)]
+    else:
+        k = max(pbot.shape[-1] if pbot.ndim == 2 else 1,
+                ptop.shape[-1] if ptop.ndim == 2 else 1)
+        pbot = np.broadcast_to(pbot.reshape(-1, 1) if pbot.ndim < 2
+                               else pbot, (n, k))
+        ptop = np.broadcast_to(ptop.reshape(-1, 1) if ptop.ndim < 2
+                               else ptop, (n, k))
+        ints = _layer_integral(index, np.concatenate([pbot, ptop], axis=1))
+        (bot0, top0), (bot1, top1) = [(i[:, :k], i[:, k:]) for i in ints]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if weighted:
+            return (top1 - bot1) / ((ptop**2 - pbot**2) / 2.)
+        return (top0 - bot0) / (ptop - pbot)
+
+
+def mean_wind(batch, pbot=850, ptop=250, stu=0, stv=0):
+    '''
+    Calculates the pressure-weighted mean wind through a layer of every
+    profile of the batch, integrated exactly over the native levels (see
+    winds.mean_wind with exact=True).
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    pbot : number, numpy array (optional; default 850 hPa)
+        Pressure of the bottom level (hPa), or one per profile
+    ptop : number, numpy array (optional; default 250 hPa)
+        Pressure of the top level (hPa), or one per profile
+    stu : number, numpy array (optional; default 0)
+        U-component of storm-motion vector
+    stv : number, numpy array (optional; default 0)
+        V-component of storm-motion vector
+
+    Returns
+    -------
+    mnu : numpy array
+        U-component
+    mnv : numpy array
+        V-component
+
+    '''
+    mnu = layer_mean(layer_index(batch, 'u'), pbot, ptop, weighted=True)
+    mnv = layer_mean(layer_index(batch, 'v'), pbot, ptop, weighted=True)
+    return mnu-stu, mnv-stv
+
+
+def mean_wind_npw(batch, pbot=850., ptop=250., stu=0, stv=0):
+    '''
+    Calculates the non-pressure-weighted mean wind through a layer of every
+    profile of the batch, integrated exactly over the native levels (see
+    winds.mean_wind_npw with exact=True).
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    pbot : number, numpy array (optional; default 850 hPa)
+        Pressure of the bottom level (hPa), or one per profile
+    ptop : number, numpy array (optional; default 250 hPa)
+        Pressure of the top level (hPa), or one per profile
+    stu : number, numpy array (optional; default 0)
+        U-component of storm-motion vector
+    stv : number, numpy array (optional; default 0)
+        V-component of storm-motion vector
+
+    Returns
+    -------
+    mnu : numpy array
+        U-component
+    mnv : numpy array
+        V-component
+
+    '''
+    mnu = layer_mean(layer_index(batch, 'u'), pbot, ptop)
+    mnv = layer_mean(layer_index(batch, 'v'), pbot, ptop)
+    return mnu-stu, mnv-stv
+
+
+def non_parcel_bunkers_motion(batch):
+    '''
+    Compute the Bunkers Storm Motion for a Right Moving Supercell for
+    every profile of the batch (see winds.non_parcel_bunkers_motion)
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+
+    Returns
+    -------
+    rstu : numpy array
+        Right Storm Motion U-component
+    rstv : numpy array
+        Right Storm Motion V-component
+    lstu : numpy array
+        Left Storm Motion U-component
+    lstv : numpy array
+        Left Storm Motion V-component
+
+    '''
+    d = utils.MS2KTS(7.5)     # Deviation value emperically derived as 7.5 m/s
+    psfc = _sfc_value(batch, 'pres', None)
+    p6km = pres(batch, to_msl(batch, 6000.))
+
+    # SFC-6km Mean Wind
+    mnu6, mnv6 = mean_wind_npw(batch, psfc, p6km)
+
+    # SFC-6km Shear Vector
+    shru6, shrv6 = wind_shear(batch, psfc, p6km)
+
+    # Bunkers Right Motion
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tmp = d / np.sqrt(shru6**2 + shrv6**2)
+    rstu = mnu6 + (tmp * shrv6)
+    rstv = mnv6 - (tmp * shru6)
+    lstu = mnu6 - (tmp * shrv6)
+    lstv = mnv6 + (tmp * shru6)
+
+    return rstu, rstv, lstu, lstv
+
+
+def max_wind(batch, layers):
+    '''
+    Finds the maximum wind speed of several layers of every profile of the
+    batch (see winds.max_wind_layers). The maxima of all of the layers of
+    all of the profiles come from a single np.maximum.reduceat.
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    layers : array_like
+        (lower, upper) pairs of the bottom and top levels of each layer
+        (m, AGL), of shape (layers, 2) for the same layers in every
+        profile or (profiles, layers, 2)
+
+    Returns
+    -------
+    maxu : numpy array
+        Maximum Wind Speed U-component, of shape (profiles, layers)
+    maxv : numpy array
+        Maximum Wind Speed V-component
+    p : numpy array
+        Pressure level (hPa) of max wind speed (the lowest if it occurs at
+        multiple levels)
+
+    Layers without any winds (e.g. extending outside of the data) are NaN.
+
+    '''
+    n = len(batch)
+    bounds = np.asarray(layers, dtype=np.float64)
+    bounds = np.broadcast_to(bounds, (n,) + bounds.shape[-2:])
+    pbounds = pres(batch, to_msl(batch, bounds.reshape(n, -1)))
+    plower = pbounds[:, 0::2, np.newaxis]
+    pupper = pbounds[:, 1::2, np.newaxis]
+    p = batch.pres[:, np.newaxis, :]
+    with np.errstate(invalid='ignore'):
+        start = np.sum(p >= plower, axis=2)
+        end = np.sum(p > pupper, axis=2)
+    # Bounds outside of the data are NaN; those layers are empty
+    end[np.isnan(plower[..., 0]) | np.isnan(pupper[..., 0])] = 0
+    wspd = np.where(np.isnan(batch.wspd), -np.inf, batch.wspd)
+    mx, first, empty = winds._segment_max(wspd, start, end)
+    rows = np.arange(n)[:, np.newaxis]
+    maxu = batch.u[rows, first]
+    maxv = batch.v[rows, first]
+    p = batch.pres[rows, first]
+    maxu[empty] = np.nan
+    maxv[empty] = np.nan
+    p[empty] = np.nan
+    return maxu, maxv, p
+
+
+def _layer_levels(batch, ok):
+    '''
+    Packs the levels selected by ok at the front of each row and returns
+    the ordering, their pressures (NaN padding), log pressures, the
+    differences of log pressure and the search index of the levels. These
+    are shared by all fields reported on the same levels (e.g. u and v)
+    and cached on the batch.
+
+    '''
+    levels = batch._cache.setdefault('layer_levels', [])
+    for level_ok, value in levels:
+        if np.array_equal(level_ok, ok):
+            return value
+    order = np.argsort(~ok, axis=1, kind='mergesort')
+    rows = np.arange(len(batch))[:, np.newaxis]
+    packed = ok[rows, order]
+    p = np.where(packed, batch.pres[rows, order], np.nan)
+    with np.errstate(invalid='ignore'):
+        logp = np.log(p)
+    value = (order, p, logp, np.diff(logp, axis=1),
+             _build_index(-logp, packed))
+    levels.append((ok, value))
+    return value
+
+
+def _layer_integral(index, p):
+    '''
+    Integrals of field dp and field p dp from the lowest level of every
+    profile of a layer_index to the pressures p (profiles, queries), NaN
+    outside of the data.
+
+    '''
+    pres, f, slope, cum0, cum1, search = index
+    keys, xp, start, end, lo, scale = search
+    n, m = pres.shape
+    nan = np.empty(p.shape)
+    nan.fill(np.nan)
+    if xp.size < 2 or m < 2:
+        return nan, nan.copy()
+    rows = np.arange(n)[:, np.newaxis]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = -np.log(p)
+        qkeys = rows + np.clip((x - lo) * scale, -0.25, 0.75)
+    j = np.searchsorted(keys, qkeys, side='right') - 1
+    first = np.minimum(start, xp.size - 1)[:, np.newaxis]
+    last = np.maximum(end - 1, 0)[:, np.newaxis]
+    j = np.clip(j, first, np.maximum(last - 1, first))
+    col = np.minimum(j - start[:, np.newaxis], m - 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        i0, i1 = interp._layer_partial(pres[rows, col], f[rows, col],
+                                       slope[rows, col], p)
+        inside = (x >= xp[first]) & (x <= xp[last]) & (last - first >= 1)
+    i0 = np.where(inside, cum0[rows, col] + i0, np.nan)
+    i1 = np.where(inside, cum1[rows, col] + i1, np.nan)
+    return i0, i1
+
+
+def wind_shear_layers(batch, layers, agl=False):
+    '''
+    Calculates the shear through several layers of every profile of the
+    batch, with the winds at all of the bounds interpolated in a single
+    call (see winds.wind_shear_layers).
+
+    Parameters
+    ----------
+    batch : batch object
+        ProfileBatch object
+    layers : array_like
+        (bottom, top) pairs of the pressures (hPa) of each layer, or of
+        the heights (m, AGL) if agl is True, of shape (layers, 2) for the
+        same layers in every profile or (profiles, layers, 2)
+    agl : bool (optional; default False)
+        The layers are given as heights (m, AGL) instead of pressures
+
+    Returns
+    -------
+    shu : numpy array
+        U-component, of shape (profiles, layers)
+    shv : numpy array
+        V-component, of shape (profiles, layers)
+
+    '''
+    n = len(batch)
+    bounds = np.asarray(layers, dtype=np.float64)
+    bounds = np.broadcast_to(bounds, (n,) + bounds.shape[-2:]).reshape(n, -1)
+    if agl:
+        bounds = pres(batch, to_msl(batch, bounds))
+    u, v = components(batch, bounds)
+    return u[:, 1::2] - u[:, 0::2], v[:, 1::2] - v[:, 0::2]
+
+
+def _sfc_value(batch, field, like):
+    '''
+    Returns the surface value of a field for every profile, shaped to
+    broadcast against the query values like.
+
+    '''
+    value = getattr(batch, field)[np.arange(len(batch)), batch.sfc]
+    if np.ndim(like) == 2:
+        return value[:, np.newaxis]
+    return value
+
+
+def _interp(batch, x, fields, coord):
+    '''
+    Interpolates fields of the batch to the coordinate value(s) x in every
+    profile. The valid points of all the profiles are flattened into one
+    array whose search keys are offset by the row number, so one
+    searchsorted call finds the bracketing levels of every query. Fields
+    reported on the same levels share the search.
+
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    n = len(batch)
+    single = x.ndim < 2
+    if single:
+        x = np.broadcast_to(x, (n,))[:, np.newaxis]
+    else:
+        x = np.broadcast_to(x, (n, x.shape[1]))
+    out = [None] * len(fields)
+    for index, fp, inds in _get_stack(batch, fields, coord):
+        vals = _interp_index(index, fp, x)
+        for i, val in zip(inds, vals):
+            out[i] = val[:, 0] if single else val
+    return out
+
+
+def _interp_index(index, fp, x):
+    '''
+    Interpolates the stacked fields fp to x (profiles, queries) using the
+    flattened search index of _build_index.
+
+    '''
+    keys, xp, start, end, lo, scale = index
+    vals = np.empty((fp.shape[0],) + x.shape)
+    vals.fill(np.nan)
+    if xp.size < 2:
+        return vals
+    rows = np.arange(x.shape[0])[:, np.newaxis]
+    # Keep queries within their own row's band of keys
+    with np.errstate(invalid='ignore'):
+        qkeys = rows + np.clip((x - lo) * scale, -0.25, 0.75)
+    j = np.searchsorted(keys, qkeys, side='right') - 1
+    first = np.minimum(start, xp.size - 1)[:, np.newaxis]
+    last = np.maximum(end - 1, 0)[:, np.newaxis]
+    j = np.clip(j, first, np.maximum(last - 1, first))
+    j1 = np.minimum(j + 1, xp.size - 1)
+    dx = xp[j1] - xp[j]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = np.where(dx == 0, 0., (x - xp[j]) / np.where(dx == 0, 1., dx))
+        inside = (x >= xp[first]) & (x <= xp[last]) & (last - first >= 1)
+    vals[:] = fp[:, j] + (fp[:, j1] - fp[:, j]) * w
+    vals[:, ~inside] = np.nan
+    return vals
+
+
+def _get_stack(batch, fields, coord):
+    '''
+    Returns (index, stacked field values, field positions) for each group
+    of fields reported on the same levels, building and caching them on
+    the batch the first time they are requested.
+
+    '''
+    key = ('stack', coord, tuple(fields))
+    if key not in batch._cache:
+        x = getattr(batch, coord)
+        # Pressure decreases with height, so log pressure is reversed to
+        # make the coordinate ascend along each row.
+        if coord == 'logp':
+            x = x[:, ::-1]
+        groups = []
+        for i, field in enumerate(fields):
+            getter = getattr(batch, 'get_%s_profile' % field, None)
+            y = getter() if getter is not None else getattr(batch, field)
+            if coord == 'logp':
+                y = y[:, ::-1]
+            ok = np.isfinite(x) & np.isfinite(y)
+            for group in groups:
+                if np.array_equal(group[0], ok):
+                    group[1].append(y[ok])
+                    group[2].append(i)
+                    break
+            else:
+                groups.append((ok, [y[ok]], [i]))
+        batch._cache[key] = [(_build_index(x, ok), np.vstack(y), inds)
+                             for ok, y, inds in groups]
+    return batch._cache[key]
+
+
+def _build_index(x, ok):
+    '''
+    Flattens the valid coordinate values of every row into one array with
+    sorted search keys (row number plus the value scaled into [0, 0.5]).
+
+    '''
+    rows = np.nonzero(ok)[0]
+    xp = x[ok]
+    if xp.size:
+        lo = xp.min()
+        span = xp.max() - lo
+    else:
+        lo, span = 0., 0.
+    scale = 0.5 / span if span > 0 else 0.
+    keys = rows + (xp - lo) * scale
+    start = np.searchsorted(rows, np.arange(x.shape[0]), side='left')
+    end = np.searchsorted(rows, np.arange(x.shape[0]), side='right')
+    return keys, xp, start, end, lo, scale
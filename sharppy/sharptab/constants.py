@@ -1,10 +1,11 @@
 ''' Frequently used meteorological constants '''
 
-__all__ = ['MISSING', 'ROCP', 'ZEROCNK', 'G', 'TOL']
+__all__ = ['MISSING', 'ROCP', 'ZEROCNK', 'G', 'TOL', 'RDGAS']
 
 # Meteorological Constants
 MISSING = -9999.0       # Missing Flag
 ROCP = 0.28571426       # R over Cp
 ZEROCNK = 273.15        # Zero Celsius in Kelvins
 G = 9.80665             # Gravity
+RDGAS = 287.04          # Gas Constant for Dry Air (J/kg/K)
 TOL = 1e-10             # Floating Point Tolerance
\ No newline at end of file
@@ -1,5 +1,6 @@
 ''' Interpolation Routines '''
 from __future__ import division
+from collections import OrderedDict
 import numpy as np
 import numpy.ma as ma
 import numpy.testing as npt
@@ -8,7 +9,13 @@ from sharppy.sharptab.constants import *
 
 
 __all__ = ['pres', 'hght', 'temp', 'dwpt', 'vtmp', 'components', 'vec']
-__all__ += ['to_agl', 'to_msl']
+__all__ += ['to_agl', 'to_msl', 'layer_index', 'layer_mean']
+__all__ += ['multi_pres', 'multi_hght', 'regrid']
+__all__ += ['layer_index_hght', 'layer_mean_hght']
+
+
+# Number of grids whose arrays regrid() keeps cached on each profile
+REGRID_CACHE_SIZE = 8
 
 
 def pres(prof, h):
@@ -27,7 +34,7 @@ def pres(prof, h):
     Pressure (hPa) at the given height
 
     '''
-    return generic_interp_hght(h, prof.hght, prof.logp, log=True)
+    return _interp_hght(prof, h, 'logp', log=True)
 
 
 def hght(prof, p):
@@ -46,11 +53,7 @@ def hght(prof, p):
     Height (m) at the given pressure
 
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    return generic_interp_pres(np.log10(p), prof.logp[::-1], prof.hght[::-1])
+    return _interp_pres(prof, p, 'hght')
 
 
 def temp(prof, p):
@@ -69,11 +72,7 @@ def temp(prof, p):
     Temperature (C) at the given pressure
 
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    return generic_interp_pres(np.log10(p), prof.logp[::-1], prof.tmpc[::-1])
+    return _interp_pres(prof, p, 'tmpc')
 
 
 def dwpt(prof, p):
@@ -93,14 +92,10 @@ def dwpt(prof, p):
     Dew point tmperature (C) at the given pressure
 
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    return generic_interp_pres(np.log10(p), prof.logp[::-1], prof.dwpc[::-1])
+    return _interp_pres(prof, p, 'dwpc')
 
 
-def vtmp(prof, p):
+def vtmp(prof, p, cached=False):
     '''
     Interpolates the given data to calculate a virtual temperature
     at a given pressure
@@ -111,19 +106,26 @@ def vtmp(prof, p):
         Profile object
     p : number, numpy array
         Pressure (hPa) of the level for which virtual temperature is desired
+    cached : bool (optional; default False)
+        Interpolate the profile's cached virtual temperature
+        (Profile.get_vtmp_profile) instead of computing it from the
+        interpolated temperature and dew point. This is a single
+        interpolation and differs by a few thousandths of a degree.
 
     Returns
     -------
     Virtual tmperature (C) at the given pressure
 
     '''
-    t = temp(prof, p)
-    td = dwpt(prof, p)
-    try:
-        vt = [thermo.virtemp(pp, tt, tdtd) for pp,tt,tdtd in zip(p, t, td)]
-        return ma.asarray(vt)
-    except TypeError:
-        return thermo.virtemp(p, t, td)
+    if cached:
+        vt = _interp_pres(prof, p, 'vtmp')
+    else:
+        p = np.asarray(p, dtype=np.float64)
+        t, td = multi_pres(prof, p, ('tmpc', 'dwpc'))
+        vt = thermo.virtemp(p, t, td)
+    if np.ndim(vt) == 0:
+        return vt
+    return ma.asarray(vt)
 
 
 def components(prof, p):
@@ -142,15 +144,137 @@ def components(prof, p):
     -------
     U and V components at the given pressure
     '''
-    # Note: numpy's interpoloation routine expects the interpoloation
-    # routine to be in ascending order. Because pressure decreases in the
-    # vertical, we must reverse the order of the two arrays to satisfy
-    # this requirement.
-    U = generic_interp_pres(np.log10(p), prof.logp[::-1], prof.u[::-1])
-    V = generic_interp_pres(np.log10(p), prof.logp[::-1], prof.v[::-1])
+    U, V = multi_pres(prof, p, ('u', 'v'))
     return U, V
 
 
+def multi_pres(prof, p, fields, monotonic=False):
+    '''
+    Interpolates several fields to the given pressure(s) at once. The
+    bracketing levels and weights are found once for every group of
+    fields reported on the same levels and applied to all of them.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    p : number, numpy array
+        Pressure (hPa) of the level(s) for which the fields are desired
+    fields : sequence of strings
+        Names of the profile fields (e.g. ('tmpc', 'dwpc', 'u', 'v'))
+    monotonic : bool (optional; default False)
+        Set if p is a sorted array without missing values (e.g. an
+        np.arange grid) to find the brackets in a single merge pass
+
+    Returns
+    -------
+    List of the interpolated fields, in the order given
+
+    '''
+    return _interp_stack(prof, np.log10(p), fields, 'logp',
+                         monotonic=monotonic)
+
+
+def multi_hght(prof, h, fields, monotonic=False):
+    '''
+    Interpolates several fields to the given height(s) at once. The
+    bracketing levels and weights are found once for every group of
+    fields reported on the same levels and applied to all of them.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    h : number, numpy array
+        Height (m) of the level(s) for which the fields are desired
+    fields : sequence of strings
+        Names of the profile fields (e.g. ('tmpc', 'u', 'v'))
+    monotonic : bool (optional; default False)
+        Set if h is a sorted array without missing values (e.g. an
+        np.arange grid) to find the brackets in a single merge pass
+
+    Returns
+    -------
+    List of the interpolated fields, in the order given
+
+    '''
+    return _interp_stack(prof, h, fields, 'hght', monotonic=monotonic)
+
+
+def regrid(prof, bot, top, step, coord='pres'):
+    '''
+    Interpolates the whole profile onto a regular vertical grid and
+    returns it as a new Profile. The grid is np.arange(bot, top+step,
+    step), so it includes top when (top - bot) is a multiple of step. The
+    interpolated arrays of the REGRID_CACHE_SIZE most recently used grids
+    are cached on the source profile, so asking for the same grid again
+    only builds the new Profile.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    bot : number
+        Bottom of the grid (hPa, or m AGL when coord is 'hght')
+    top : number
+        Top of the grid (hPa, or m AGL when coord is 'hght')
+    step : number
+        Grid spacing (hPa, or m when coord is 'hght'). The sign is set
+        from the coordinate, so pressure grids always decrease and height
+        grids always increase.
+    coord : string (optional; default 'pres')
+        Vertical coordinate of the grid, 'pres' or 'hght'
+
+    Returns
+    -------
+    Profile object on the grid. Levels outside of the data are missing.
+
+    '''
+    if coord == 'pres':
+        step = -abs(step)
+    elif coord == 'hght':
+        step = abs(step)
+    else:
+        raise ValueError("coord must be 'pres' or 'hght'")
+    key = (coord, float(bot), float(top), float(step))
+    token = prof._token(('pres', 'hght', 'logp', 'tmpc', 'dwpc', 'u', 'v'))
+    grids = prof._cache.setdefault('regrid', OrderedDict())
+    entry = grids.pop(key, None)
+    if entry is None or entry[0] != token:
+        entry = (token, _regrid_arrays(prof, bot, top, step, coord))
+    # Most recently used last; the oldest grids are dropped
+    grids[key] = entry
+    while len(grids) > REGRID_CACHE_SIZE:
+        grids.popitem(last=False)
+    data = dict((name, val.copy()) for name, val in entry[1].items())
+    return prof.__class__(missing=prof.missing, **data)
+
+
+def _regrid_arrays(prof, bot, top, step, coord):
+    '''
+    Interpolates the data fields of the profile onto the grid of regrid
+    and returns them as a dict of plain arrays, with the missing flag of
+    the profile outside of the data.
+
+    '''
+    levels = np.arange(bot, top+step, step, dtype=np.float64)
+    if coord == 'pres':
+        p = levels
+        h, t, td, u, v = multi_pres(prof, p,
+            ('hght', 'tmpc', 'dwpc', 'u', 'v'), monotonic=True)
+    else:
+        h = ma.getdata(to_msl(prof, levels))
+        p = 10**multi_hght(prof, h, ('logp',), monotonic=True)[0]
+        # Pressures above the data are NaN, so p may not be sorted
+        t, td, u, v = multi_pres(prof, p, ('tmpc', 'dwpc', 'u', 'v'))
+    data = {}
+    for name, val in zip(('pres', 'hght', 'tmpc', 'dwpc', 'u', 'v'),
+                         (p, h, t, td, u, v)):
+        val = ma.filled(ma.asanyarray(val, dtype=np.float64), np.nan)
+        data[name] = np.where(np.isnan(val), prof.missing, val)
+    return data
+
+
 def vec(p, prof):
     '''
     Interpolates the given data to calculate the wind direction and speed
@@ -209,6 +333,289 @@ def to_msl(prof, h):
     return h + prof.hght[prof.sfc]
 
 
+def layer_index(pres, field):
+    '''
+    Builds the cumulative pressure integrals of a field over its native
+    levels so that layer means can be found with layer_mean. The field is
+    taken to vary linearly with log pressure between levels (as in the
+    other interpolation routines) and is integrated exactly.
+
+    Parameters
+    ----------
+    pres : numpy array
+        The array of pressure (hPa)
+    field : numpy array
+        The variable which is being integrated
+
+    Returns
+    -------
+    index : tuple of numpy arrays
+        Pressures and field values at the valid levels (pressure
+        decreasing), the slope of the field with respect to ln(p) on each
+        layer, and the cumulative integrals of field dp and field p dp
+        from the lowest valid level up to each level
+
+    '''
+    not_masked = ~(ma.getmaskarray(pres) | ma.getmaskarray(field))
+    p = ma.getdata(pres)[not_masked].astype(np.float64)
+    f = ma.getdata(field)[not_masked].astype(np.float64)
+    order = np.argsort(-p, kind='mergesort')
+    p = p[order]
+    f = f[order]
+    dlogp = np.diff(np.log(p))
+    slope = np.zeros(dlogp.shape)
+    nonzero = dlogp != 0
+    slope[nonzero] = np.diff(f)[nonzero] / dlogp[nonzero]
+    cum0 = np.zeros(p.shape)
+    cum1 = np.zeros(p.shape)
+    if p.size > 1:
+        i0, i1 = _layer_partial(p[:-1], f[:-1], slope, p[1:])
+        cum0[1:] = np.cumsum(i0)
+        cum1[1:] = np.cumsum(i1)
+    return p, f, slope, cum0, cum1
+
+
+def layer_mean(index, pbot, ptop, weighted=False):
+    '''
+    Returns the mean of a field through one or more layers using the
+    cumulative integrals from layer_index. Each layer costs two lookups,
+    independent of how many levels it spans.
+
+    Parameters
+    ----------
+    index : tuple of numpy arrays
+        Cumulative integrals of the field from layer_index
+    pbot : number, numpy array
+        Pressure of the bottom level (hPa)
+    ptop : number, numpy array
+        Pressure of the top level (hPa)
+    weighted : bool (optional; default False)
+        Return the pressure-weighted mean instead of the mean with respect
+        to pressure
+
+    Returns
+    -------
+    Mean of the field through each layer (NaN for layers that extend
+    outside of the data)
+
+    '''
+    pbot, ptop = np.broadcast_arrays(np.asarray(pbot, dtype=np.float64),
+                                     np.asarray(ptop, dtype=np.float64))
+    # Both bounds are looked up in a single pass
+    (bot0, top0), (bot1, top1) = _layer_integral(index,
+                                                 np.stack([pbot, ptop]))
+    if weighted:
+        return (top1 - bot1) / ((ptop**2 - pbot**2) / 2.)
+    return (top0 - bot0) / (ptop - pbot)
+
+
+def layer_index_hght(hght, field):
+    '''
+    Builds the cumulative height integrals of a field over its native
+    levels so that layer means with respect to height can be found with
+    layer_mean_hght. The field is taken to vary linearly with height
+    between levels and is integrated exactly.
+
+    Parameters
+    ----------
+    hght : numpy array
+        The array of height (m)
+    field : numpy array
+        The variable which is being integrated
+
+    Returns
+    -------
+    index : tuple of numpy arrays
+        Heights and field values at the valid levels (height increasing)
+        and the cumulative integral of field dz from the lowest valid level
+        up to each level
+
+    '''
+    not_masked = ~(ma.getmaskarray(hght) | ma.getmaskarray(field))
+    h = ma.getdata(hght)[not_masked].astype(np.float64)
+    f = ma.getdata(field)[not_masked].astype(np.float64)
+    order = np.argsort(h, kind='mergesort')
+    h = h[order]
+    f = f[order]
+    cum = np.zeros(h.shape)
+    cum[1:] = np.cumsum((f[1:] + f[:-1]) / 2. * np.diff(h))
+    return h, f, cum
+
+
+def layer_mean_hght(index, hbot, htop):
+    '''
+    Returns the mean of a field with respect to height through one or more
+    layers using the cumulative integrals from layer_index_hght.
+
+    Parameters
+    ----------
+    index : tuple of numpy arrays
+        Cumulative integrals of the field from layer_index_hght
+    hbot : number, numpy array
+        Height of the bottom level (m)
+    htop : number, numpy array
+        Height of the top level (m)
+
+    Returns
+    -------
+    Mean of the field through each layer (NaN for layers that extend
+    outside of the data)
+
+    '''
+    hbot, htop = np.broadcast_arrays(np.asarray(hbot, dtype=np.float64),
+                                     np.asarray(htop, dtype=np.float64))
+    bot, top = _layer_integral_hght(index, np.stack([hbot, htop]))
+    return (top - bot) / (htop - hbot)
+
+
+def _layer_integral_hght(index, h):
+    '''
+    Integral of field dz from the lowest level of a layer_index_hght to the
+    height h (NaN outside of the data).
+
+    '''
+    hght, f, cum = index
+    if hght.size < 2:
+        nan = np.empty(h.shape)
+        nan.fill(np.nan)
+        return nan
+    k = np.clip(np.searchsorted(hght, h, side='right') - 1, 0, hght.size - 2)
+    dz = hght[k+1] - hght[k]
+    w = np.where(dz == 0, 0., (h - hght[k]) / np.where(dz == 0, 1., dz))
+    fh = f[k] + (f[k+1] - f[k]) * w
+    outside = (h < hght[0]) | (h > hght[-1]) | ~np.isfinite(h)
+    return np.where(outside, np.nan, cum[k] + (f[k] + fh) / 2. * (h - hght[k]))
+
+
+def _layer_integral(index, p):
+    '''
+    Integrals of field dp and field p dp from the lowest level of a
+    layer_index to the pressure p (NaN outside of the data).
+
+    '''
+    pres, f, slope, cum0, cum1 = index
+    p = np.asarray(p, dtype=np.float64)
+    if pres.size < 2:
+        nan = np.empty(p.shape)
+        nan.fill(np.nan)
+        return nan, nan
+    k = np.searchsorted(-pres, -p, side='right') - 1
+    k = np.clip(k, 0, pres.size - 2)
+    i0, i1 = _layer_partial(pres[k], f[k], slope[k], p)
+    outside = (p > pres[0]) | (p < pres[-1]) | ~np.isfinite(p)
+    i0 = np.where(outside, np.nan, cum0[k] + i0)
+    i1 = np.where(outside, np.nan, cum1[k] + i1)
+    return i0, i1
+
+
+def _layer_partial(p0, f0, slope, p):
+    '''
+    Integrals of field dp and field p dp from p0 to p of a field that is
+    f0 at p0 and changes by slope per unit ln(p).
+
+    '''
+    dlogp = np.log(p) - np.log(p0)
+    i0 = f0 * (p - p0) + slope * (p * dlogp - (p - p0))
+    i1 = f0 * (p**2 - p0**2) / 2. + \
+        slope * (p**2 * dlogp / 2. - (p**2 - p0**2) / 4.)
+    return i0, i1
+
+
+def _interp_pres(prof, p, field, logp=None):
+    '''
+    Interpolates a profile field to the given pressure(s) using the
+    ascending arrays cached on the profile (see
+    Profile.get_interp_arrays).
+
+    '''
+    if logp is None:
+        logp = np.log10(p)
+    x, y = prof.get_interp_arrays(field)
+    return np.interp(logp, x, y, left=ma.masked, right=ma.masked)
+
+
+def _interp_hght(prof, h, field, log=False):
+    '''
+    Interpolates a profile field to the given height(s) using the
+    ascending arrays cached on the profile (see
+    Profile.get_interp_arrays).
+
+    '''
+    x, y = prof.get_interp_arrays(field, coord='hght')
+    if log:
+        return 10**np.interp(h, x, y, left=ma.masked, right=ma.masked)
+    return np.interp(h, x, y, left=ma.masked, right=ma.masked)
+
+
+def _interp_stack(prof, x, fields, coord, monotonic=False):
+    '''
+    Interpolates the stacked field groups from Profile.get_interp_stack to
+    the coordinate value(s) x. Values outside of the data are NaN, as with
+    np.interp and a masked left/right value. If monotonic is True, x must
+    be a finite, sorted (ascending or descending) array and the brackets
+    are found with a merge of the two sequences.
+
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    merge = monotonic and x.ndim == 1 and x.size > 1
+    out = [None] * len(fields)
+    for xp, fp, inds in prof.get_interp_stack(fields, coord=coord):
+        vals = np.empty((fp.shape[0],) + x.shape)
+        vals.fill(np.nan)
+        if xp.size > 1:
+            if merge:
+                j, w, inside = _merge_bracket(xp, x)
+            else:
+                j, w, inside = _bracket(xp, x)
+            vals[:, inside] = fp[:, j] + (fp[:, j+1] - fp[:, j]) * w
+        for i, val in zip(inds, vals):
+            out[i] = val[()]
+    return out
+
+
+def _bracket(xp, x):
+    '''
+    Finds the index of the lower bracketing point in the ascending array
+    xp (at least two points) and the interpolation weight for each value
+    of x inside of the data. Also returns the boolean mask of those values.
+
+    '''
+    with np.errstate(invalid='ignore'):
+        inside = (x >= xp[0]) & (x <= xp[-1])
+    x = x[inside]
+    j = np.minimum(np.searchsorted(xp, x, side='right') - 1, xp.size - 2)
+    return j, _weights(xp, x, j), inside
+
+
+def _merge_bracket(xp, x):
+    '''
+    Same as _bracket for a sorted query array x, but the values of x inside
+    of the data are returned as a slice. Rather than searching xp for every
+    query, the interior points of xp are located in x and the bracketing
+    index is their running count, so the cost is set by the size of xp.
+
+    '''
+    if x[0] > x[-1]:
+        n = x.size
+        j, w, inside = _merge_bracket(xp, x[::-1])
+        return j[::-1], w[::-1], slice(n - inside.stop, n - inside.start)
+    lo = np.searchsorted(x, xp[0], side='left')
+    hi = np.searchsorted(x, xp[-1], side='right')
+    x = x[lo:hi]
+    starts = np.searchsorted(x, xp[1:-1], side='left')
+    j = np.cumsum(np.bincount(starts, minlength=x.size+1)[:x.size])
+    return j, _weights(xp, x, j), slice(lo, hi)
+
+
+def _weights(xp, x, j):
+    '''
+    Returns the weight of the upper bracketing point xp[j+1] for each x.
+
+    '''
+    dx = xp[j+1] - xp[j]
+    return np.where(dx == 0, 0., (x - xp[j]) / np.where(dx == 0, 1., dx))
+
+
 def generic_interp_hght(h, hght, field, log=False):
     '''
     Generic interpolation routine
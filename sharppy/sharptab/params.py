@@ -0,0 +1,428 @@
+''' Parcel Lifting and Stability Routines '''
+from __future__ import division
+import numpy as np
+import numpy.ma as ma
+from sharppy.sharptab import interp, thermo
+from sharppy.sharptab.constants import *
+
+
+__all__ = ['Parcel', 'parcel_trace', 'parcelx', 'lift_parcels']
+__all__ += ['most_unstable_level', 'mean_theta', 'mean_mixratio']
+__all__ += ['mixed_layer_parcel']
+
+
+class Parcel(object):
+    '''
+    Initial state and lifted trace of a parcel
+
+    '''
+    def __init__(self, pres, tmpc, dwpc):
+        '''
+        Create a parcel and find its LCL
+
+        Parameters
+        ----------
+        pres : number
+            Pressure of the parcel (hPa)
+        tmpc : number
+            Temperature of the parcel (C)
+        dwpc : number
+            Dew point of the parcel (C)
+
+        Returns
+        -------
+        A parcel object
+
+        '''
+        self.pres = pres
+        self.tmpc = tmpc
+        self.dwpc = dwpc
+        self.lclpres, self.lcltemp = thermo.drylift(pres, tmpc, dwpc)
+        self.lclvtmp = thermo.virtemp(self.lclpres, self.lcltemp,
+                                      self.lcltemp)
+        self.ptrace = ma.masked
+        self.ttrace = ma.masked
+        self.vtrace = ma.masked
+        self.bplus = ma.masked
+        self.bminus = ma.masked
+        self.lfcpres = ma.masked
+        self.elpres = ma.masked
+
+
+def parcel_trace(prof, pres=None, tmpc=None, dwpc=None, table=False):
+    '''
+    Lifts a parcel through the profile and returns its temperature and
+    virtual temperature at every level. The parcel is lifted dry
+    adiabatically to its LCL once; every level above the LCL lies on the
+    same moist adiabat, so they are all solved in a single array call to
+    thermo.satlift instead of one thermo.lifted call per level.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    pres : number (optional; default surface)
+        Pressure of the parcel (hPa)
+    tmpc : number (optional; default surface)
+        Temperature of the parcel (C)
+    dwpc : number (optional; default surface)
+        Dew point of the parcel (C)
+    table : bool (optional; default False)
+        Use the precomputed moist adiabat table (thermo.satlift_lookup)
+
+    Returns
+    -------
+    pcl : parcel object
+        Parcel with ptrace, ttrace and vtrace (pressure, temperature and
+        virtual temperature) aligned with prof.pres. Levels below the
+        parcel are masked.
+
+    '''
+    if pres is None: pres = prof.pres[prof.sfc]
+    if tmpc is None: tmpc = prof.tmpc[prof.sfc]
+    if dwpc is None: dwpc = prof.dwpc[prof.sfc]
+    pcl = Parcel(pres, tmpc, dwpc)
+
+    p = ma.asanyarray(prof.pres, dtype=np.float64).copy()
+    p[p > pres] = ma.masked
+    dry = ma.filled(p >= pcl.lclpres, False)
+    moist = ma.filled(p < pcl.lclpres, False)
+
+    ttrace = ma.masked_all(p.shape, dtype=np.float64)
+    vtrace = ma.masked_all(p.shape, dtype=np.float64)
+
+    # Below the LCL: dry adiabat, constant mixing ratio
+    pd = p[dry]
+    ttrace[dry] = thermo.theta(1000., thermo.theta(pres, tmpc), pd)
+    dwpt = thermo.temp_at_mixrat(thermo.mixratio(pres, dwpc), pd)
+    vtrace[dry] = thermo.virtemp(pd, ttrace[dry], dwpt)
+
+    # Above the LCL: one moist adiabat, saturated
+    thta = thermo.theta(pcl.lclpres, pcl.lcltemp, 1000.)
+    thetam = thta - thermo.wobf(thta) + thermo.wobf(pcl.lcltemp)
+    pm = p[moist]
+    if table:
+        ttrace[moist] = thermo.satlift_lookup(pm, thetam)
+    else:
+        ttrace[moist] = thermo.satlift(pm, thetam)
+    vtrace[moist] = thermo.virtemp(pm, ttrace[moist], ttrace[moist])
+
+    pcl.ptrace = p
+    pcl.ttrace = ttrace
+    pcl.vtrace = vtrace
+    return pcl
+
+
+def lift_parcels(pres, tmpc, dwpc, levels, table=False):
+    '''
+    Lifts many parcels to a common set of pressure levels at once. Each
+    parcel follows its dry adiabat to its LCL and its moist adiabat above
+    it; all parcels and levels are solved together in one array pass.
+
+    Parameters
+    ----------
+    pres : number, numpy array
+        Pressure of the parcels (hPa)
+    tmpc : number, numpy array
+        Temperature of the parcels (C)
+    dwpc : number, numpy array
+        Dew point of the parcels (C)
+    levels : number, numpy array
+        Pressure levels to which the parcels are lifted (hPa)
+    table : bool (optional; default False)
+        Use the precomputed moist adiabat table (thermo.satlift_lookup)
+
+    Returns
+    -------
+    Temperature (C) of each parcel at each level as a masked array of
+    shape (number of parcels, number of levels). Levels below a parcel
+    are masked.
+
+    '''
+    pres = ma.atleast_1d(ma.asanyarray(pres, dtype=np.float64))
+    tmpc = ma.atleast_1d(ma.asanyarray(tmpc, dtype=np.float64))
+    dwpc = ma.atleast_1d(ma.asanyarray(dwpc, dtype=np.float64))
+    levels = ma.atleast_1d(ma.asanyarray(levels, dtype=np.float64))
+    lclpres, lcltemp = thermo.drylift(pres, tmpc, dwpc)
+    thta = thermo.theta(pres, tmpc, 1000.)
+    thta_lcl = thermo.theta(lclpres, lcltemp, 1000.)
+    thetam = thta_lcl - thermo.wobf(thta_lcl) + thermo.wobf(lcltemp)
+
+    shape = (pres.size, levels.size)
+    mask = ma.getmaskarray(pres)[:, np.newaxis] | \
+        ma.getmaskarray(tmpc)[:, np.newaxis] | \
+        ma.getmaskarray(dwpc)[:, np.newaxis] | \
+        ma.getmaskarray(levels)[np.newaxis, :]
+    lev = np.broadcast_to(ma.getdata(levels)[np.newaxis, :], shape)
+    mask = mask | (lev > ma.getdata(pres)[:, np.newaxis])
+    dry = ~mask & (lev >= ma.getdata(lclpres)[:, np.newaxis])
+    moist = ~mask & ~dry
+
+    out = np.empty(shape)
+    out.fill(np.nan)
+    thta = np.broadcast_to(ma.getdata(thta)[:, np.newaxis], shape)
+    out[dry] = thermo.theta(1000., thta[dry], lev[dry])
+    thetam = np.broadcast_to(ma.getdata(thetam)[:, np.newaxis], shape)
+    if table:
+        out[moist] = thermo.satlift_lookup(lev[moist], thetam[moist])
+    else:
+        out[moist] = thermo.satlift(lev[moist], thetam[moist])
+    return ma.masked_array(out, mask=mask)
+
+
+def parcelx(prof, pres=None, tmpc=None, dwpc=None, table=False):
+    '''
+    Lifts a parcel through the profile and integrates its buoyancy to find
+    CAPE, CIN, the LFC and the EL. The parcel minus environment virtual
+    temperature is integrated in ln(p) over the native levels, with the
+    parcel origin, the LCL and every zero crossing inserted exactly.
+
+    CAPE (bplus) is the positive area between the LFC and the EL. CIN
+    (bminus) is the negative area between the parcel origin and the LFC.
+    The LFC is the lowest level at or above the LCL where the parcel
+    becomes positively buoyant and the EL is the top of the highest
+    positively buoyant layer (the top of the profile if the parcel is
+    still buoyant there). A parcel without an LFC has a bplus and bminus
+    of 0 and masked lfcpres and elpres.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    pres : number (optional; default surface)
+        Pressure of the parcel (hPa)
+    tmpc : number (optional; default surface)
+        Temperature of the parcel (C)
+    dwpc : number (optional; default surface)
+        Dew point of the parcel (C)
+    table : bool (optional; default False)
+        Use the precomputed moist adiabat table (thermo.satlift_lookup)
+
+    Returns
+    -------
+    pcl : parcel object
+        Parcel from parcel_trace with bplus (J/kg), bminus (J/kg), lfcpres
+        (hPa) and elpres (hPa) set
+
+    '''
+    pcl = parcel_trace(prof, pres=pres, tmpc=tmpc, dwpc=dwpc, table=table)
+    vtmp = prof.get_vtmp_profile()
+    ok = ~(ma.getmaskarray(pcl.vtrace) | ma.getmaskarray(vtmp))
+    p = ma.getdata(prof.pres)[ok]
+    diff = ma.getdata(pcl.vtrace)[ok] - ma.getdata(vtmp)[ok]
+
+    # Insert the parcel origin and LCL as levels
+    extra_p = [pcl.pres]
+    extra_diff = [thermo.virtemp(pcl.pres, pcl.tmpc, pcl.dwpc) -
+                  interp.vtmp(prof, pcl.pres)]
+    if pcl.lclpres < pcl.pres:
+        extra_p.append(pcl.lclpres)
+        extra_diff.append(pcl.lclvtmp - interp.vtmp(prof, pcl.lclpres))
+    p = np.concatenate([p, ma.filled(extra_p, np.nan)])
+    diff = np.concatenate([diff, ma.filled(extra_diff, np.nan)])
+    keep = np.isfinite(p) & np.isfinite(diff)
+    p = p[keep]
+    diff = diff[keep]
+    order = np.argsort(-p, kind='mergesort')
+    p = p[order]
+    diff = diff[order]
+
+    lfc, el, pos, neg = _buoyancy_integrals(np.log(p), diff,
+                                            np.log(pcl.lclpres))
+    if lfc is None:
+        pcl.bplus = 0.
+        pcl.bminus = 0.
+        return pcl
+    pcl.lfcpres = np.exp(lfc)
+    pcl.elpres = np.exp(el)
+    pcl.bplus = RDGAS * pos
+    pcl.bminus = RDGAS * neg
+    return pcl
+
+
+def _buoyancy_integrals(logp, diff, loglcl):
+    '''
+    Integrates a buoyancy profile in ln(p) using the trapezoid rule with
+    exact zero crossing insertion.
+
+    Parameters
+    ----------
+    logp : numpy array
+        Natural log of pressure (ln hPa), decreasing with height
+    diff : numpy array
+        Parcel minus environment virtual temperature (C)
+    loglcl : number
+        Natural log of the LCL pressure (ln hPa)
+
+    Returns
+    -------
+    lfc : number
+        ln(p) of the LFC (None if the parcel has no LFC)
+    el : number
+        ln(p) of the EL
+    pos : number
+        Positive area between the LFC and EL (K)
+    neg : number
+        Negative area below the LFC (K)
+
+    '''
+    if logp.size < 2:
+        return None, None, 0., 0.
+    a = diff[:-1]
+    b = diff[1:]
+    dx = logp[:-1] - logp[1:]
+    cross = ((a < 0) & (b > 0)) | ((a > 0) & (b < 0))
+    f = np.ones(a.shape)
+    f[cross] = a[cross] / (a[cross] - b[cross])
+    xcross = logp[:-1] - f * dx
+    pos = np.where(cross, np.where(a > 0, a * f, b * (1. - f)),
+                   np.maximum(a, 0) + np.maximum(b, 0)) * dx / 2.
+    neg = np.where(cross, np.where(a < 0, a * f, b * (1. - f)),
+                   np.minimum(a, 0) + np.minimum(b, 0)) * dx / 2.
+
+    # LFC: the parcel at the LCL is already buoyant, or the first negative
+    # to positive crossing in a segment that starts at or above the LCL.
+    above = logp[:-1] <= loglcl + TOL
+    starts = np.nonzero(above & (a <= 0) & (b > 0))[0]
+    ilcl = np.nonzero(above)[0]
+    if ilcl.size and a[ilcl[0]] > 0:
+        ilfc = ilcl[0]
+        lfc = logp[ilfc]
+    elif starts.size:
+        ilfc = starts[0]
+        lfc = xcross[ilfc] if cross[ilfc] else logp[ilfc]
+    else:
+        return None, None, 0., 0.
+
+    # EL: the last positive to negative crossing above the LFC
+    ends = np.nonzero((a > 0) & (b <= 0))[0]
+    ends = ends[ends >= ilfc]
+    if ends.size:
+        iel = ends[-1]
+        el = xcross[iel] if cross[iel] else logp[iel+1]
+    else:
+        iel = a.size - 1
+        el = logp[-1]
+    return lfc, el, pos[ilfc:iel+1].sum(), neg[:ilfc].sum() + \
+        (neg[ilfc] if cross[ilfc] and a[ilfc] < 0 else 0.)
+
+
+def most_unstable_level(prof, pbot=None, ptop=None):
+    '''
+    Finds the most unstable level in a layer, defined as the level with
+    the highest equivalent potential temperature. The profile's cached
+    column theta-e is searched at the native levels inside the layer along
+    with the two layer bounds.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    pbot : number (optional; default surface)
+        Pressure of the bottom level (hPa)
+    ptop : number (optional; default 300 hPa above pbot)
+        Pressure of the top level (hPa)
+
+    Returns
+    -------
+    Pressure (hPa) of the most unstable level
+
+    '''
+    if pbot is None: pbot = prof.pres[prof.sfc]
+    if ptop is None: ptop = pbot - 300.
+    thetae = prof.get_thetae_profile()
+    ok = ~(ma.getmaskarray(thetae) | ma.getmaskarray(prof.pres))
+    ok &= (ma.getdata(prof.pres) <= pbot) & (ma.getdata(prof.pres) >= ptop)
+    bounds = np.asarray([pbot, ptop], dtype=np.float64)
+    p = np.concatenate([ma.getdata(prof.pres)[ok], bounds])
+    thetae = np.concatenate([ma.getdata(thetae)[ok], ma.filled(
+        thermo.thetae(bounds, interp.temp(prof, bounds),
+                      interp.dwpt(prof, bounds)), np.nan)])
+    return p[np.nanargmax(thetae)]
+
+
+def mean_theta(prof, pbot=None, ptop=None):
+    '''
+    Calculates the pressure-weighted mean potential temperature through
+    one or more layers. Potential temperature is computed at the native
+    levels and integrated exactly between them (see interp.layer_index).
+    The integrals are cached on the profile (Profile.get_layer_index), so
+    many layers, or repeated calls, cost little more than one lookup.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    pbot : number, numpy array (optional; default surface)
+        Pressure of the bottom level (hPa)
+    ptop : number, numpy array (optional; default 100 hPa above pbot)
+        Pressure of the top level (hPa)
+
+    Returns
+    -------
+    Mean potential temperature (C) of each layer
+
+    '''
+    if pbot is None: pbot = prof.pres[prof.sfc]
+    if ptop is None: ptop = pbot - 100.
+    return interp.layer_mean(prof.get_layer_index('theta'), pbot, ptop,
+                             weighted=True)
+
+
+def mean_mixratio(prof, pbot=None, ptop=None):
+    '''
+    Calculates the pressure-weighted mean mixing ratio through one or more
+    layers. Mixing ratio is computed at the native levels and integrated
+    exactly between them (see interp.layer_index). The integrals are
+    cached on the profile (Profile.get_layer_index), so many layers, or
+    repeated calls, cost little more than one lookup.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    pbot : number, numpy array (optional; default surface)
+        Pressure of the bottom level (hPa)
+    ptop : number, numpy array (optional; default 100 hPa above pbot)
+        Pressure of the top level (hPa)
+
+    Returns
+    -------
+    Mean mixing ratio (g/kg) of each layer
+
+    '''
+    if pbot is None: pbot = prof.pres[prof.sfc]
+    if ptop is None: ptop = pbot - 100.
+    return interp.layer_mean(prof.get_layer_index('mixratio'), pbot, ptop,
+                             weighted=True)
+
+
+def mixed_layer_parcel(prof, depth=100.):
+    '''
+    Defines the mixed-layer parcel(s) for one or more mixing depths above
+    the surface: the mean potential temperature and mixing ratio of the
+    layer brought to the surface pressure.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile object
+    depth : number, numpy array (optional; default 100 hPa)
+        Depth of the mixed layer (hPa)
+
+    Returns
+    -------
+    pres : number, numpy array
+        Pressure of the parcel (hPa)
+    tmpc : number, numpy array
+        Temperature of the parcel (C)
+    dwpc : number, numpy array
+        Dew point of the parcel (C)
+
+    '''
+    pbot = prof.pres[prof.sfc]
+    ptop = pbot - np.asarray(depth, dtype=np.float64)
+    pres = pbot * np.ones(ptop.shape)
+    tmpc = thermo.theta(1000., mean_theta(prof, pbot, ptop), pres)
+    dwpc = thermo.temp_at_mixrat(mean_mixratio(prof, pbot, ptop), pres)
+    return pres, tmpc, dwpc
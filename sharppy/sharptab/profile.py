@@ -1,16 +1,41 @@
 ''' Create the Sounding (Profile) Object '''
 from __future__ import division
+import zlib
 import numpy as np
 import numpy.ma as ma
-from sharppy.sharptab import utils
+from sharppy.sharptab import utils, thermo, interp
 from sharppy.sharptab.constants import MISSING
 
 
+def _checksum(a, crc=0):
+    '''
+    Returns a checksum of the data and mask of an array, continuing from a
+    previous checksum. It changes when the array is edited in place, so it
+    is used to tell whether values derived from the array are still
+    current.
+
+    '''
+    try:
+        return zlib.crc32(getattr(a, '_mask', ma.nomask), zlib.crc32(a, crc))
+    except (TypeError, ValueError, BufferError):
+        # Not a contiguous buffer (e.g. a strided view)
+        return zlib.crc32(ma.getmaskarray(a).tobytes(),
+                          zlib.crc32(ma.getdata(a).tobytes(), crc))
+
+
 class Profile(object):
     '''
     The default data class for SHARPpy
 
     '''
+    # The data fields that each derived profile is computed from
+    _derived = {'vtmp': ('pres', 'tmpc', 'dwpc'),
+                'thetae': ('pres', 'tmpc', 'dwpc'),
+                'thetaw': ('pres', 'tmpc', 'dwpc'),
+                'wetbulb': ('pres', 'tmpc', 'dwpc'),
+                'theta': ('pres', 'tmpc'),
+                'mixratio': ('pres', 'dwpc')}
+
     def __init__(self, **kwargs):
         '''
         Create the sounding data object
@@ -88,6 +113,7 @@ class Profile(object):
         self.u.set_fill_value(self.missing)
         self.v.set_fill_value(self.missing)
         self.sfc = self.get_sfc()
+        self._cache = {}
 
 
     def get_sfc(self):
@@ -107,3 +133,492 @@ class Profile(object):
         '''
         return np.where(~self.tmpc.mask)[0].min()
 
+
+    def reset_cache(self):
+        '''
+        Discards all derived profiles cached on the object. Cached values
+        are checked against the data they were computed from and rebuilt
+        after the data arrays are modified or replaced, so this is only
+        needed to free the memory.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        '''
+        self._cache = {}
+
+
+    def _token(self, fields):
+        '''
+        Returns a checksum of the named fields (or of the fields a derived
+        profile is computed from) that changes when any of them is edited.
+
+        '''
+        token = 0
+        for name in fields:
+            for field in self._derived.get(name, (name,)):
+                token = _checksum(getattr(self, field), token)
+        return token
+
+
+    def _cached(self, key, fields, build):
+        '''
+        Returns the value cached under key, calling build() to create it
+        the first time and again whenever any of the named fields (or the
+        fields a derived profile is computed from) has changed since.
+
+        '''
+        token = self._token(fields)
+        entry = self._cache.get(key)
+        if entry is None or entry[0] != token:
+            entry = (token, build())
+            self._cache[key] = entry
+        return entry[1]
+
+
+    def get_interp_arrays(self, field, coord='logp'):
+        '''
+        Returns the coordinate and field values used to interpolate a
+        field: the levels where both are reported, in ascending order of
+        the coordinate, as plain numpy arrays. They are built the first
+        time they are requested and cached, so repeated interpolations do
+        not reverse, mask and copy the profile again. They are rebuilt if
+        the data they come from is modified.
+
+        Parameters
+        ----------
+        field : string
+            Name of the profile attribute to interpolate (e.g. 'tmpc'), or
+            of a derived profile with a get_<field>_profile method (e.g.
+            'vtmp' or 'thetae')
+        coord : string (optional; default 'logp')
+            Name of the coordinate attribute, 'logp' or 'hght'
+
+        Returns
+        -------
+        x : numpy array
+            Coordinate values (ascending)
+        y : numpy array
+            Field values
+
+        '''
+        def build():
+            x = getattr(self, coord)
+            # Derived fields (e.g. 'vtmp') come from their cached profiles
+            getter = getattr(self, 'get_%s_profile' % field, None)
+            y = getter() if getter is not None else getattr(self, field)
+            not_masked = ~(ma.getmaskarray(x) | ma.getmaskarray(y))
+            x = ma.getdata(x)[not_masked]
+            y = ma.getdata(y)[not_masked]
+            # Pressure decreases with height, so log pressure is reversed
+            # to satisfy np.interp's requirement of ascending values.
+            if coord == 'logp':
+                x = x[::-1]
+                y = y[::-1]
+            return x, y
+        return self._cached(('interp', coord, field), (coord, field), build)
+
+
+    def get_interp_stack(self, fields, coord='logp'):
+        '''
+        Returns the arrays used to interpolate several fields at once.
+        Fields that are reported on the same levels (e.g. u and v) are
+        stacked into one group so that they can share a single search for
+        the bracketing levels. Each group is built from the arrays of
+        get_interp_arrays, and the grouping is cached.
+
+        Parameters
+        ----------
+        fields : sequence of strings
+            Names of the profile attributes to interpolate
+        coord : string (optional; default 'logp')
+            Name of the coordinate attribute, 'logp' or 'hght'
+
+        Returns
+        -------
+        List of (x, y, inds) groups: the ascending coordinate values, the
+        field values stacked with shape (len(inds), len(x)), and the
+        positions of those fields in the fields argument
+
+        '''
+        fields = tuple(fields)
+        def build():
+            groups = []
+            for i, field in enumerate(fields):
+                x, y = self.get_interp_arrays(field, coord=coord)
+                for group in groups:
+                    if group[0] is x or np.array_equal(group[0], x):
+                        group[1].append(y)
+                        group[2].append(i)
+                        break
+                else:
+                    groups.append((x, [y], [i]))
+            return [(x, np.vstack(y), inds) for x, y, inds in groups]
+        return self._cached(('stack', coord, fields), (coord,) + fields,
+                            build)
+
+
+    def get_layer_index(self, field, coord='pres'):
+        '''
+        Returns the cumulative integrals of a field over the native levels
+        of the profile, so that the mean through any layer costs two
+        lookups (interp.layer_mean, or interp.layer_mean_hght when coord is
+        'hght'). The index is built the first time it is requested and
+        cached.
+
+        Parameters
+        ----------
+        field : string
+            Name of the profile attribute (e.g. 'u'), or of a derived
+            profile with a get_<field>_profile method (e.g. 'vtmp')
+        coord : string (optional; default 'pres')
+            Vertical coordinate of the integrals, 'pres' or 'hght'
+
+        Returns
+        -------
+        Index from interp.layer_index or interp.layer_index_hght
+
+        '''
+        if coord not in ('pres', 'hght'):
+            raise ValueError("coord must be 'pres' or 'hght'")
+        def build():
+            getter = getattr(self, 'get_%s_profile' % field, None)
+            y = getter() if getter is not None else getattr(self, field)
+            if coord == 'pres':
+                return interp.layer_index(self.pres, y)
+            return interp.layer_index_hght(self.hght, y)
+        return self._cached(('layer', coord, field), (coord, field), build)
+
+
+    def get_vtmp_profile(self):
+        '''
+        Returns the virtual temperature (C) at every level of the profile.
+        It is computed for the whole column in one call the first time it
+        is requested and cached.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Virtual temperature (C) at each level
+
+        '''
+        return self._cached('vtmp', ('vtmp',),
+                            lambda: thermo.virtemp(self.pres, self.tmpc,
+                                                   self.dwpc))
+
+
+    def get_thetae_profile(self):
+        '''
+        Returns the equivalent potential temperature (C) at every level of
+        the profile. It is computed for the whole column in one call the
+        first time it is requested and cached.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Equivalent potential temperature (C) at each level
+
+        '''
+        return self._cached('thetae', ('thetae',),
+                            lambda: thermo.thetae(self.pres, self.tmpc,
+                                                  self.dwpc))
+
+
+    def get_thetaw_profile(self):
+        '''
+        Returns the wetbulb potential temperature (C) at every level of the
+        profile. It is computed for the whole column in one call the first
+        time it is requested and cached.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Wetbulb potential temperature (C) at each level
+
+        '''
+        return self._cached('thetaw', ('thetaw',),
+                            lambda: thermo.thetaw(self.pres, self.tmpc,
+                                                  self.dwpc))
+
+
+    def get_wetbulb_profile(self):
+        '''
+        Returns the wetbulb temperature (C) at every level of the profile.
+        It is computed for the whole column in one call the first time it
+        is requested and cached.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Wetbulb temperature (C) at each level
+
+        '''
+        return self._cached('wetbulb', ('wetbulb',),
+                            lambda: thermo.wetbulb(self.pres, self.tmpc,
+                                                   self.dwpc))
+
+
+    def get_theta_profile(self):
+        '''
+        Returns the potential temperature (C) at every level of the
+        profile. It is computed for the whole column in one call the first
+        time it is requested and cached.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Potential temperature (C) at each level
+
+        '''
+        return self._cached('theta', ('theta',),
+                            lambda: thermo.theta(self.pres, self.tmpc))
+
+
+    def get_mixratio_profile(self):
+        '''
+        Returns the mixing ratio (g/kg) at every level of the profile. It
+        is computed for the whole column in one call the first time it is
+        requested and cached.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Mixing ratio (g/kg) at each level
+
+        '''
+        return self._cached('mixratio', ('mixratio',),
+                            lambda: thermo.mixratio(self.pres, self.dwpc))
+
+
+class ProfileBatch(object):
+    '''
+    Many soundings stored together as padded 2D arrays, one row per
+    profile and one column per level, so that routines in
+    sharppy.sharptab.batch can work on all of them at once. Missing values
+    are NaN. The levels of each profile that report a pressure are packed
+    at the front of its row and the rest of the row is padding.
+
+    The data arrays are read-only, so they cannot be edited in place
+    behind the derived fields cached on the batch. Assigning a new array
+    to one of them (e.g. batch.tmpc = tmpc) stores a read-only copy and
+    discards the cache. New arrays must keep the packed layout of pres.
+
+    '''
+    # Data arrays guarded by __setattr__
+    _fields = ('pres', 'hght', 'tmpc', 'dwpc', 'logp', 'u', 'v', 'wdir',
+               'wspd')
+
+    def __init__(self, **kwargs):
+        '''
+        Create the batch data object
+
+        Parameters
+        ----------
+        Takes the same keywords as Profile, but each array_like is two
+        dimensional with shape (number of profiles, number of levels).
+        Either the missing flag or NaN may mark missing values, and the
+        levels of a profile must be ordered by decreasing pressure.
+
+        Returns
+        -------
+        A batch object
+
+        '''
+        self.missing = kwargs.get('missing', MISSING)
+        pres = self._as_field(kwargs.get('pres'))
+        # Pack the levels with a reported pressure at the front of each row
+        order = np.argsort(np.isnan(pres), axis=1, kind='mergesort')
+        rows = np.arange(pres.shape[0])[:, np.newaxis]
+        self.nlev = np.sum(~np.isnan(pres), axis=1)
+        ncol = self.nlev.max() if self.nlev.size else 0
+        order = order[:, :ncol]
+        take = lambda name: self._as_field(kwargs.get(name))[rows, order]
+        self.pres = pres[rows, order]
+        self.hght = take('hght')
+        self.tmpc = take('tmpc')
+        self.dwpc = take('dwpc')
+        self.logp = np.log10(self.pres)
+        if 'wdir' in kwargs:
+            wdir = take('wdir')
+            wspd = take('wspd')
+            missing = np.isnan(wdir) | np.isnan(wspd)
+            wdir[missing] = np.nan
+            wspd[missing] = np.nan
+            self.wdir = wdir
+            self.wspd = wspd
+            self.u, self.v = utils.vec2comp(wdir, wspd, missing=np.nan)
+        elif 'u' in kwargs:
+            u = take('u')
+            v = take('v')
+            missing = np.isnan(u) | np.isnan(v)
+            u[missing] = np.nan
+            v[missing] = np.nan
+            self.u = u
+            self.v = v
+            self.wdir, self.wspd = utils.comp2vec(u, v, missing=np.nan)
+        self._cache = {}
+
+
+    def __setattr__(self, name, value):
+        '''
+        Stores the data arrays as read-only copies (NaN for missing) and
+        discards the cached derived fields whenever one is replaced.
+
+        '''
+        if name in self._fields:
+            value = self._as_field(value)
+            value.flags.writeable = False
+            object.__setattr__(self, '_cache', {})
+            object.__setattr__(self, name, value)
+            if name == 'tmpc':
+                object.__setattr__(self, 'sfc', self.get_sfc())
+        else:
+            object.__setattr__(self, name, value)
+
+
+    @classmethod
+    def from_profiles(cls, profiles):
+        '''
+        Create a batch from a sequence of Profile objects. Profiles with
+        fewer levels are padded with NaN.
+
+        Parameters
+        ----------
+        profiles : sequence of profile objects
+            The soundings to combine
+
+        Returns
+        -------
+        A batch object
+
+        '''
+        profiles = list(profiles)
+        if not profiles:
+            raise ValueError('A batch needs at least one profile')
+        nlev = max([prof.pres.size for prof in profiles])
+        data = {}
+        for name in ('pres', 'hght', 'tmpc', 'dwpc', 'u', 'v'):
+            arr = np.empty((len(profiles), nlev))
+            arr.fill(np.nan)
+            for i, prof in enumerate(profiles):
+                field = ma.asanyarray(getattr(prof, name), dtype=np.float64)
+                arr[i, :field.size] = ma.filled(field, np.nan)
+            data[name] = arr
+        return cls(missing=profiles[0].missing, **data)
+
+
+    def _as_field(self, arr):
+        '''
+        Converts an input array to a 2D float array with NaN for missing.
+
+        '''
+        arr = ma.asanyarray(arr, dtype=np.float64)
+        arr = np.array(ma.filled(arr, np.nan), dtype=np.float64, ndmin=2)
+        arr[arr == self.missing] = np.nan
+        return arr
+
+
+    def __len__(self):
+        return self.pres.shape[0]
+
+
+    def get_sfc(self):
+        '''
+        Convenience function to get the index of the surface of every
+        profile. It is determined by finding the lowest level in which a
+        temperature is reported.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Index of the surface of each profile (numpy array)
+
+        '''
+        return np.argmax(~np.isnan(self.tmpc), axis=1)
+
+
+    def get_profile(self, i):
+        '''
+        Returns a single profile of the batch as a Profile object.
+
+        Parameters
+        ----------
+        i : int
+            Index of the profile
+
+        Returns
+        -------
+        A profile object
+
+        '''
+        data = {}
+        for name in ('pres', 'hght', 'tmpc', 'dwpc', 'u', 'v'):
+            field = getattr(self, name)[i, :self.nlev[i]]
+            data[name] = np.where(np.isnan(field), self.missing, field)
+        return Profile(missing=self.missing, **data)
+
+
+    def reset_cache(self):
+        '''
+        Discards all derived fields cached on the object. The data arrays
+        are read-only and replacing one already discards the cache, so
+        this is only needed to free the memory.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        '''
+        self._cache = {}
+
+
+    def get_vtmp_profile(self):
+        '''
+        Returns the virtual temperature (C) at every level of every
+        profile. It is computed in one call the first time it is requested
+        and cached.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Virtual temperature (C) with the shape of the data arrays
+
+        '''
+        if 'vtmp' not in self._cache:
+            with np.errstate(invalid='ignore'):
+                self._cache['vtmp'] = thermo.virtemp(self.pres, self.tmpc,
+                                                     self.dwpc)
+        return self._cache['vtmp']
@@ -1,14 +1,21 @@
 ''' Thermodynamic Library '''
 from __future__ import division
+import os
+import tempfile
+import zipfile
+import zlib
 import numpy as np
 import numpy.ma as ma
 from sharppy.sharptab.constants import *
+from sharppy.sharptab.utils import SCALAR_TYPES
 
 __all__ = ['drylift', 'thalvl', 'lcltemp', 'theta', 'wobf']
-__all__ += ['satlift', 'wetlift', 'lifted', 'vappres', 'mixratio']
+__all__ += ['satlift', 'satlift_table', 'satlift_lookup', 'wetlift']
+__all__ += ['lifted', 'vappres', 'mixratio']
 __all__ += ['temp_at_mixrat', 'wetbulb', 'thetaw', 'thetae']
 __all__ += ['virtemp', 'relh']
 __all__ += ['ftoc', 'ctof', 'ctok', 'ktoc', 'ftok', 'ktof']
+__all__ += ['set_backend']
 
 
 # Constants Used
@@ -16,6 +23,106 @@ c1 = 0.0498646455 ; c2 = 2.4082965 ; c3 = 7.07475
 c4 = 38.9114 ; c5 = 0.0915 ; c6 = 1.2035
 eps = 0.62197
 
+# Moist adiabat lookup table: satlift evaluated on a grid that is evenly
+# spaced in ln(p) and thetam. See satlift_table() and satlift_lookup().
+SATLIFT_TABLE_PBOT = 1100.
+SATLIFT_TABLE_PTOP = 50.
+SATLIFT_TABLE_NPRES = 241
+SATLIFT_TABLE_THMBOT = -80.
+SATLIFT_TABLE_THMTOP = 60.
+SATLIFT_TABLE_NTHM = 281
+SATLIFT_TABLE_VERSION = 1
+SATLIFT_TABLE_PATH = os.path.join(os.environ.get('SHARPPY_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.sharppy')), 'satlift_table.npz')
+_satlift_table = None
+
+# Array backend for wobf, satlift, vappres, mixratio and lcltemp. It is
+# chosen on first use by set_backend(): the compiled kernels in
+# _thermo_numba when numba can be imported, otherwise plain numpy.
+BACKEND = None
+_kernels = None
+
+
+def set_backend(backend=None):
+    '''
+    Selects the implementation used when wobf, satlift, vappres, mixratio
+    and lcltemp are given numpy arrays. Both backends have the same
+    signatures and results; 'numba' runs compiled kernels and 'numpy'
+    runs the array code in this module.
+
+    Parameters
+    ----------
+    backend : string (optional; default None)
+        'numba', 'numpy' or None. None picks 'numba' if it can be imported
+        and 'numpy' otherwise, unless the SHARPPY_THERMO_BACKEND
+        environment variable names a backend.
+
+    Returns
+    -------
+    The name of the selected backend
+
+    '''
+    global BACKEND, _kernels
+    if backend is None:
+        backend = os.environ.get('SHARPPY_THERMO_BACKEND')
+    if backend == 'numpy':
+        _kernels = None
+    elif backend in (None, 'numba'):
+        try:
+            from sharppy.sharptab import _thermo_numba
+        except ImportError:
+            if backend == 'numba':
+                raise
+            _thermo_numba = None
+        _kernels = _thermo_numba
+    else:
+        raise ValueError("Unknown thermo backend '%s'" % backend)
+    BACKEND = 'numpy' if _kernels is None else 'numba'
+    return BACKEND
+
+
+def _use_kernels(*args):
+    '''
+    Returns True if the compiled kernels should handle these arguments:
+    the numba backend is selected and at least one argument is a numpy
+    array (plain or masked). Masked arrays are passed through
+    _run_kernel.
+
+    '''
+    for arg in args:
+        if isinstance(arg, np.ndarray):
+            break
+    else:
+        return False
+    if BACKEND is None:
+        set_backend()
+    return _kernels is not None
+
+
+def _run_kernel(kernel, *args):
+    '''
+    Calls a compiled kernel. Plain arrays are passed straight through. If
+    any argument is a masked array (e.g. Profile data), the kernel is
+    evaluated on the unmasked elements only and the combined mask is
+    applied to the result.
+
+    '''
+    for arg in args:
+        if isinstance(arg, ma.MaskedArray):
+            break
+    else:
+        return kernel(*args)
+    data = np.broadcast_arrays(*[ma.getdata(arg) for arg in args])
+    mask = np.zeros(data[0].shape, dtype=bool)
+    for arg in args:
+        mask = mask | ma.getmaskarray(arg)
+    out = np.empty(mask.shape, dtype=np.float64)
+    out.fill(np.nan)
+    ok = ~mask
+    out[ok] = kernel(*[d[ok] for d in data])
+    return ma.masked_array(out, mask=mask)
+
+
 def drylift(p, t, td):
     '''
     Lifts a parcel to the LCL and returns its new level and temperature.
@@ -58,6 +165,8 @@ def lcltemp(t, td):
     Temperature (C) of the parcel at it's LCL.
 
     '''
+    if _use_kernels(t, td):
+        return _run_kernel(_kernels.lcltemp, t, td)
     s = t - td
     dlt = s * (1.2185 + 0.001278 * t + s * (-0.00219 + 1.173e-5 * s -
         0.0000052 * t))
@@ -103,6 +212,9 @@ def theta(p, t, p2=1000.):
     Potential temperature (C)
 
     '''
+    if isinstance(p, SCALAR_TYPES) and isinstance(t, SCALAR_TYPES) and \
+            isinstance(p2, SCALAR_TYPES):
+        return ((t + ZEROCNK) * (p2 / p)**ROCP) - ZEROCNK
     p = np.ma.asanyarray(p)
     p2 = p2 * np.ones(p.shape, dtype=np.float64)
     return ((t + ZEROCNK) * (p2 / p)**ROCP) - ZEROCNK
@@ -114,11 +226,11 @@ def thetaw(p, t, td):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         The pressure of the parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of the parcel (C)
-    td : number
+    td : number, numpy array
         Dew point of parcel (C)
 
     Returns
@@ -136,11 +248,11 @@ def thetae(p, t, td):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         The pressure of the parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of the parcel (C)
-    td : number
+    td : number, numpy array
         Dew point of parcel (C)
 
     Returns
@@ -210,6 +322,8 @@ def wobf(t):
     Correction to theta (C) for calculation of saturated potential temperature.
 
     '''
+    if _use_kernels(t):
+        return _run_kernel(_kernels.wobf, t)
     t = t - 20
 
     npol = 1 + t * (-8.841660499999999e-3 + t * ( 1.4714143e-4
@@ -232,6 +346,8 @@ def wobf(t):
         correction = np.zeros(t.shape, dtype=np.float64)
         correction[t <= 0] = npol[t <= 0]
         correction[t > 0] = ppol[t > 0]
+        if isinstance(t, ma.MaskedArray):
+            return ma.masked_array(correction, mask=ma.getmask(t))
         return correction
 
 
@@ -242,9 +358,9 @@ def satlift(p, thetam):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         Pressure to which parcel is raised (hPa)
-    thetam : number
+    thetam : number, numpy array
         Saturated Potential Temperature of parcel (C)
 
     Returns
@@ -252,9 +368,11 @@ def satlift(p, thetam):
     Temperature (C) of saturated parcel at new level
 
     '''
-    if np.fabs(p - 1000.) - 0.001 <= 0: return thetam
+    if np.ndim(p) or np.ndim(thetam):
+        return _satlift_array(p, thetam)
+    if abs(p - 1000.) - 0.001 <= 0: return thetam
     eor = 999
-    while np.fabs(eor) - 0.1 > 0:
+    while abs(eor) - 0.1 > 0:
         if eor == 999:                  # First Pass
             pwrp = (p / 1000.)**ROCP
             t1 = (thetam + ZEROCNK) * pwrp - ZEROCNK
@@ -271,18 +389,249 @@ def satlift(p, thetam):
     return t2 - eor
 
 
-def wetlift(p, t, p2):
+def _satlift_array(p, thetam):
+    '''
+    Array version of satlift. All elements are iterated together using the
+    same secant steps as the scalar loop; elements are dropped from the
+    working set as soon as they converge, so each one finishes on exactly
+    the iteration the scalar loop would have. With the numba backend the
+    same loop runs compiled for each element instead.
+
+    Parameters
+    ----------
+    p : numpy array
+        Pressure to which parcel is raised (hPa)
+    thetam : numpy array
+        Saturated Potential Temperature of parcel (C)
+
+    Returns
+    -------
+    Temperature (C) of saturated parcel at new level (same shape as the
+    broadcast inputs; masked where either input is masked)
+
+    '''
+    mask = ma.getmaskarray(p) | ma.getmaskarray(thetam)
+    p, thetam, mask = np.broadcast_arrays(ma.getdata(p), ma.getdata(thetam),
+                                          mask)
+    shape = p.shape
+    p = p.astype(np.float64).ravel()
+    thetam = thetam.astype(np.float64).ravel()
+    mask = mask.ravel()
+    out = np.empty(p.shape, dtype=np.float64)
+    out.fill(np.nan)
+
+    # Parcels already at 1000 hPa need no lifting; missing or non-finite
+    # values would never converge, so they are left out of the iteration.
+    ok = ~mask & np.isfinite(p) & np.isfinite(thetam)
+    at1000 = ok & (np.fabs(p - 1000.) - 0.001 <= 0)
+    out[at1000] = thetam[at1000]
+    idx = np.nonzero(ok & ~at1000)[0]
+    if idx.size and _use_kernels(p):
+        out[idx] = _kernels.satlift(p[idx], thetam[idx])
+    elif idx.size:
+        out[idx] = _satlift_secant(p[idx], thetam[idx])
+
+    out = out.reshape(shape)
+    if mask.any():
+        return ma.masked_array(out, mask=mask.reshape(shape))
+    return out
+
+
+def _satlift_secant(p, thetam):
+    '''
+    Secant iteration of satlift for 1-D arrays of pressure (hPa) and
+    saturated potential temperature (C). Converged elements are dropped
+    from the working set after every pass.
+
+    '''
+    out = np.empty(p.shape, dtype=np.float64)
+    idx = np.arange(p.size)
+    pwrp = (p / 1000.)**ROCP
+    t1 = (thetam + ZEROCNK) * pwrp - ZEROCNK
+    e1 = wobf(t1) - wobf(thetam)
+    rate = np.ones(idx.shape, dtype=np.float64)
+    while idx.size:
+        t2 = t1 - (e1 * rate)
+        e2 = (t2 + ZEROCNK) / pwrp - ZEROCNK
+        e2 += wobf(t2) - wobf(e2) - thetam
+        eor = e2 * rate
+        done = ~(np.fabs(eor) - 0.1 > 0)
+        out[idx[done]] = t2[done] - eor[done]
+        keep = ~done
+        idx = idx[keep]
+        pwrp = pwrp[keep]
+        thetam = thetam[keep]
+        t1, t2 = t1[keep], t2[keep]
+        e1, e2 = e1[keep], e2[keep]
+        rate = (t2 - t1) / (e2 - e1)
+        t1 = t2
+        e1 = e2
+    return out
+
+
+def satlift_table(path=None):
+    '''
+    Returns the moist adiabat lookup table used by satlift_lookup. The table
+    is satlift evaluated on a grid of SATLIFT_TABLE_NPRES pressures (evenly
+    spaced in ln(p) from SATLIFT_TABLE_PBOT to SATLIFT_TABLE_PTOP) by
+    SATLIFT_TABLE_NTHM saturated potential temperatures (SATLIFT_TABLE_THMBOT
+    to SATLIFT_TABLE_THMTOP). It is built on first use, kept in memory and
+    cached to disk so later sessions only have to load it. A cached file
+    is only used if it was written with the same SATLIFT_TABLE_VERSION and
+    grid; SATLIFT_TABLE_VERSION must be increased whenever satlift changes.
+
+    Parameters
+    ----------
+    path : string (optional; default SATLIFT_TABLE_PATH)
+        File used to cache the table. The default location can be changed
+        with the SHARPPY_CACHE_DIR environment variable.
+
+    Returns
+    -------
+    logp : numpy array
+        Natural log of the table pressures (ln hPa), decreasing
+    thetam : numpy array
+        Table saturated potential temperatures (C), increasing
+    temps : numpy array
+        Temperature (C) of the saturated parcel, shape (len(logp),
+        len(thetam))
+
+    '''
+    global _satlift_table
+    if path is None:
+        if _satlift_table is not None:
+            return _satlift_table
+        path = SATLIFT_TABLE_PATH
+    logp = np.linspace(np.log(SATLIFT_TABLE_PBOT), np.log(SATLIFT_TABLE_PTOP),
+                       SATLIFT_TABLE_NPRES)
+    thm = np.linspace(SATLIFT_TABLE_THMBOT, SATLIFT_TABLE_THMTOP,
+                      SATLIFT_TABLE_NTHM)
+    table = None
+    try:
+        with np.load(path) as cached:
+            if cached['version'] == SATLIFT_TABLE_VERSION and \
+                    np.array_equal(cached['logp'], logp) and \
+                    np.array_equal(cached['thetam'], thm):
+                temps = cached['temps']
+                if temps.shape == (logp.size, thm.size):
+                    table = (logp, thm, temps)
+    except (IOError, OSError, KeyError, ValueError, EOFError,
+            zipfile.BadZipfile, zlib.error):
+        # Missing, stale, truncated or otherwise unreadable; rebuild it
+        pass
+    if table is None:
+        table = (logp, thm, satlift(np.exp(logp)[:, np.newaxis],
+                                    thm[np.newaxis, :]))
+        _save_satlift_table(path, table)
+    if path == SATLIFT_TABLE_PATH:
+        _satlift_table = table
+    return table
+
+
+def _save_satlift_table(path, table):
+    '''
+    Writes the lookup table to path. The file is written to a temporary
+    name in the same directory and then renamed, so an interrupted or
+    concurrent save never leaves a partial file at path. Failures are
+    ignored; the table is simply rebuilt next time.
+
+    '''
+    tmp = None
+    try:
+        dirname = os.path.dirname(path) or os.curdir
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        fd, tmp = tempfile.mkstemp(suffix='.npz', dir=dirname)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, version=SATLIFT_TABLE_VERSION, logp=table[0],
+                     thetam=table[1], temps=table[2])
+        os.rename(tmp, path)
+        tmp = None
+    except (IOError, OSError):
+        pass
+    finally:
+        if tmp is not None and os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def satlift_lookup(p, thetam):
+    '''
+    Table-driven version of satlift. Returns the temperature (C) of a
+    saturated parcel when lifted to a new pressure level (hPa) by bilinear
+    interpolation in ln(p) and thetam of the table from satlift_table().
+    Values outside of the table fall back to satlift.
+
+    Inside the table the maximum difference from satlift is about 0.05 C,
+    which is below the 0.1 C convergence tolerance of the iterative solver
+    itself (that tolerance, not the grid spacing, sets the error; a finer
+    grid or bicubic interpolation does not reduce it).
+
+    The gain depends on the backend. For 200,000 random parcels the lookup
+    takes about 0.03 s, against about 0.17 s for the array satlift with
+    the numpy backend (about 6x) and 0.04 s with the numba backend (only
+    about 1.5x), and against several seconds for per-element satlift
+    calls. When numba is available the table mostly saves the iteration
+    on large arrays; it is not worth it for a handful of parcels.
+
+    Parameters
+    ----------
+    p : number, numpy array
+        Pressure to which parcel is raised (hPa)
+    thetam : number, numpy array
+        Saturated Potential Temperature of parcel (C)
+
+    Returns
+    -------
+    Temperature (C) of saturated parcel at new level
+
+    '''
+    logp, thm, temps = satlift_table()
+    mask = ma.getmaskarray(p) | ma.getmaskarray(thetam)
+    p, thetam, mask = np.broadcast_arrays(ma.getdata(p), ma.getdata(thetam),
+                                          mask)
+    shape = p.shape
+    p = p.astype(np.float64).ravel()
+    thetam = thetam.astype(np.float64).ravel()
+    x = (np.log(p) - logp[0]) / (logp[1] - logp[0])
+    y = (thetam - thm[0]) / (thm[1] - thm[0])
+    inside = (x >= 0) & (x <= logp.size - 1) & (y >= 0) & (y <= thm.size - 1)
+    i = np.clip(np.floor(np.where(inside, x, 0)).astype(int), 0,
+                logp.size - 2)
+    j = np.clip(np.floor(np.where(inside, y, 0)).astype(int), 0,
+                thm.size - 2)
+    fx = x - i
+    fy = y - j
+    out = (temps[i, j] * (1. - fx) + temps[i+1, j] * fx) * (1. - fy) + \
+          (temps[i, j+1] * (1. - fx) + temps[i+1, j+1] * fx) * fy
+    outside = ~inside & ~mask.ravel()
+    if outside.any():
+        out[outside] = satlift(p[outside], thetam[outside])
+    if not shape:
+        return ma.masked if mask else out[0]
+    out = out.reshape(shape)
+    if mask.any():
+        return ma.masked_array(out, mask=mask)
+    return out
+
+
+def wetlift(p, t, p2, table=False):
     '''
     Lifts a parcel moist adiabatically to its new level.
 
     Parameters
     -----------
-    p : number
+    p : number, numpy array
         Pressure of initial parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of initial parcel (C)
-    p2 : number
+    p2 : number, numpy array
         Pressure of final level (hPa)
+    table : bool (optional; default False)
+        Use the precomputed moist adiabat table (satlift_lookup) instead
+        of solving for the moist adiabat with satlift
 
     Returns
     -------
@@ -291,6 +640,8 @@ def wetlift(p, t, p2):
     '''
     thta = theta(p, t, 1000.)
     thetam = thta - wobf(thta) + wobf(t)
+    if table:
+        return satlift_lookup(p2, thetam)
     return satlift(p2, thetam)
 
 
@@ -301,13 +652,13 @@ def lifted(p, t, td, lev):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         Pressure of initial parcel in hPa
-    t : number
+    t : number, numpy array
         Temperature of initial parcel in C
-    td : number
+    td : number, numpy array
         Dew Point of initial parcel in C
-    lev : number
+    lev : number, numpy array
         Pressure to which parcel is lifted in hPa
 
     Returns
@@ -333,6 +684,8 @@ def vappres(t):
     Vapor Pressure of dry air
 
     '''
+    if _use_kernels(t):
+        return _run_kernel(_kernels.vappres, t)
     pol = t * (1.1112018e-17 + (t * -3.0994571e-20))
     pol = t * (2.1874425e-13 + (t * (-1.789232e-15 + pol)))
     pol = t * (4.3884180e-09 + (t * (-2.988388e-11 + pol)))
@@ -357,6 +710,8 @@ def mixratio(p, t):
     Mixing Ratio (g/kg) of the given parcel
 
     '''
+    if _use_kernels(p, t):
+        return _run_kernel(_kernels.mixratio, p, t)
     x = 0.02 * (t - 12.5 + (7500. / p))
     wfw = 1. + (0.0000045 * p) + (0.0014 * x * x)
     fwesw = wfw * vappres(t)
@@ -390,11 +745,11 @@ def wetbulb(p, t, td):
 
     Parameters
     ----------
-    p : number
+    p : number, numpy array
         Pressure of parcel (hPa)
-    t : number
+    t : number, numpy array
         Temperature of parcel (C)
-    td : number
+    td : number, numpy array
         Dew Point of parcel (C)
 
     Returns
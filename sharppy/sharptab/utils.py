@@ -1,5 +1,6 @@
 ''' Frequently used functions '''
 from __future__ import division
+import math
 import numpy as np
 import numpy.ma as ma
 from sharppy.sharptab.constants import MISSING, TOL
@@ -8,6 +9,14 @@ __all__ = ['MS2KTS', 'KTS2MS', 'MS2MPH', 'MPH2MS', 'MPH2KTS', 'KTS2MPH']
 __all__ += ['M2FT', 'FT2M', 'vec2comp', 'comp2vec', 'mag']
 
 
+# Python number types that take the scalar fast paths (numpy float64 is a
+# subclass of float)
+try:
+    SCALAR_TYPES = (int, long, float)
+except NameError:
+    SCALAR_TYPES = (int, float)
+
+
 def MS2KTS(val):
     '''
     Convert meters per second to knots
@@ -144,6 +153,20 @@ def FT2M(val):
     return val * 0.3048
 
 
+def _nan_mode(missing, *args):
+    '''
+    Returns True if NaN is the missing value and none of the arguments
+    are masked arrays, in which case the plain array fast paths are used.
+
+    '''
+    if missing == missing:
+        return False
+    for arg in args:
+        if isinstance(arg, ma.MaskedArray):
+            return False
+    return True
+
+
 def _vec2comp(wdir, wspd):
     '''
     Underlying function that converts a vector to its components
@@ -180,7 +203,9 @@ def vec2comp(wdir, wspd, missing=MISSING):
         Magnitudes of wind vector (input units == output units)
     missing : number (optional)
         Optional missing parameter. If not given, assume default missing
-        value from sharppy.sharptab.constants.MISSING
+        value from sharppy.sharptab.constants.MISSING. If NaN and the
+        inputs are not masked arrays, NaN marks missing values and plain
+        arrays are returned without any masked array processing.
 
     Returns
     -------
@@ -190,6 +215,37 @@ def vec2comp(wdir, wspd, missing=MISSING):
         V-component of the wind (units are the same as those of input speed)
 
     '''
+    if isinstance(wdir, SCALAR_TYPES) and isinstance(wspd, SCALAR_TYPES):
+        if wdir == missing or wspd == missing:
+            return ma.masked, ma.masked
+        rad = math.radians(wdir % 360.)
+        u = wspd * math.sin(rad) * -1
+        v = wspd * math.cos(rad) * -1
+        if math.fabs(u) < TOL:
+            u = 0.
+        if math.fabs(v) < TOL:
+            v = 0.
+        return u, v
+    if _nan_mode(missing, wdir, wspd):
+        # Work in place on the temporaries to avoid extra copies. They
+        # take the broadcast shape of the inputs (e.g. a scalar wdir and
+        # an array wspd).
+        wdir = np.asarray(wdir, dtype=np.float64)
+        wspd = np.asarray(wspd, dtype=np.float64)
+        rad = np.empty(np.broadcast(wdir, wspd).shape, dtype=np.float64)
+        np.remainder(wdir, 360., out=rad)
+        np.radians(rad, out=rad)
+        # 0-d inputs give numpy scalars, which cannot be written in place
+        u = np.asarray(np.sin(rad))
+        v = np.cos(rad, out=rad)
+        u *= wspd
+        v *= wspd
+        np.negative(u, out=u)
+        np.negative(v, out=v)
+        with np.errstate(invalid='ignore'):
+            u[np.fabs(u) < TOL] = 0.
+            v[np.fabs(v) < TOL] = 0.
+        return u[()], v[()]
     wdir = ma.asanyarray(wdir).astype(np.float64)
     wspd = ma.asanyarray(wspd).astype(np.float64)
     wdir.set_fill_value(missing)
@@ -230,7 +286,9 @@ def comp2vec(u, v, missing=MISSING):
         V-component of the wind
     missing : number (optional)
         Optional missing parameter. If not given, assume default missing
-        value from sharppy.sharptab.constants.MISSING
+        value from sharppy.sharptab.constants.MISSING. If NaN and the
+        inputs are not masked arrays, NaN marks missing values and plain
+        arrays are returned without any masked array processing.
 
     Returns
     -------
@@ -240,6 +298,25 @@ def comp2vec(u, v, missing=MISSING):
         Magnitudes of wind vector (input units == output units)
 
     '''
+    if isinstance(u, SCALAR_TYPES) and isinstance(v, SCALAR_TYPES):
+        if u == missing or v == missing:
+            return ma.masked, ma.masked
+        wdir = math.degrees(math.atan2(-u, -v))
+        if wdir < 0:
+            wdir += 360
+        if math.fabs(wdir) < TOL:
+            wdir = 0.
+        return wdir, math.sqrt(u**2 + v**2)
+    if _nan_mode(missing, u, v):
+        u = np.asarray(u, dtype=np.float64)
+        v = np.asarray(v, dtype=np.float64)
+        # 0-d inputs give numpy scalars, which cannot be written in place
+        wdir = np.asarray(np.arctan2(-u, -v))
+        np.degrees(wdir, out=wdir)
+        with np.errstate(invalid='ignore'):
+            wdir[wdir < 0] += 360
+            wdir[np.fabs(wdir) < TOL] = 0.
+        return wdir[()], np.sqrt(u**2 + v**2)[()]
     u = ma.asanyarray(u).astype(np.float64)
     v = ma.asanyarray(v).astype(np.float64)
     u.set_fill_value(missing)
@@ -274,7 +351,9 @@ def mag(u, v, missing=MISSING):
         V-component of the wind
     missing : number (optional)
         Optional missing parameter. If not given, assume default missing
-        value from sharppy.sharptab.constants.MISSING
+        value from sharppy.sharptab.constants.MISSING. If NaN and the
+        inputs are not masked arrays, NaN marks missing values and plain
+        arrays are returned without any masked array processing.
 
     Returns
     -------
@@ -282,6 +361,14 @@ def mag(u, v, missing=MISSING):
         The magnitude of the vector (units are the same as input)
 
     '''
+    if isinstance(u, SCALAR_TYPES) and isinstance(v, SCALAR_TYPES):
+        if u == missing or v == missing:
+            return ma.masked
+        return math.sqrt(u**2 + v**2)
+    if _nan_mode(missing, u, v):
+        u = np.asarray(u, dtype=np.float64)
+        v = np.asarray(v, dtype=np.float64)
+        return np.sqrt(u**2 + v**2)[()]
     u = np.ma.asanyarray(u).astype(np.float64)
     v = np.ma.asanyarray(v).astype(np.float64)
     u.set_fill_value(missing)
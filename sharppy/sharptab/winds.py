@@ -8,10 +8,12 @@ from sharppy.sharptab.constants import *
 
 __all__ = ['mean_wind', 'mean_wind_npw', 'mean_wind_old', 'mean_wind_npw_old']
 __all__ += ['sr_wind', 'sr_wind_npw', 'wind_shear', 'helicity', 'max_wind']
+__all__ += ['helicity_layers', 'srh_map', 'kinematics', 'max_wind_layers']
+__all__ += ['wind_shear_layers']
 __all__ += ['non_parcel_bunkers_motion', 'corfidi_mcs_motion', 'mbe_vectors']
 
 
-def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0):
+def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0, exact=False):
     '''
     Calculates a pressure-weighted mean wind through a layer. The default
     layer is 850 to 200 hPa.
@@ -30,6 +32,11 @@ def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0):
         U-component of storm-motion vector
     stv : number (optional; default 0)
         V-component of storm-motion vector
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind analytically over
+        the native levels of the data (exact) or averaging the
+        interpolated sounding at 'dp' pressure levels. With exact, pbot
+        and ptop may be arrays to average several layers at once.
 
     Returns
     -------
@@ -39,14 +46,20 @@ def mean_wind(prof, pbot=850, ptop=250, dp=-1, stu=0, stv=0):
         V-component
 
     '''
+    if exact:
+        mnu = interp.layer_mean(prof.get_layer_index('u'), pbot, ptop,
+                                weighted=True)
+        mnv = interp.layer_mean(prof.get_layer_index('v'), pbot, ptop,
+                                weighted=True)
+        return mnu-stu, mnv-stv
     if dp > 0: dp = -dp
-    ps = np.arange(pbot, ptop+dp, dp)
-    u, v = interp.components(prof, ps)
-    # u -= stu; v -= stv
-    return ma.average(u, weights=ps)-stu, ma.average(v, weights=ps)-stv
+    ps = np.arange(pbot, ptop+dp, dp, dtype=np.float64)
+    u, v = interp.multi_pres(prof, ps, ('u', 'v'), monotonic=True)
+    return np.average(u, weights=ps)-stu, np.average(v, weights=ps)-stv
 
 
-def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0):
+def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0,
+                  exact=False):
     '''
     Calculates a non-pressure-weighted mean wind through a layer. The default
     layer is 850 to 200 hPa.
@@ -65,6 +78,11 @@ def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0):
         U-component of storm-motion vector
     stv : number (optional; default 0)
         V-component of storm-motion vector
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind analytically over
+        the native levels of the data (exact) or averaging the
+        interpolated sounding at 'dp' pressure levels. With exact, pbot
+        and ptop may be arrays to average several layers at once.
 
     Returns
     -------
@@ -74,14 +92,17 @@ def mean_wind_npw(prof, pbot=850., ptop=250., dp=-1, stu=0, stv=0):
         V-component
 
     '''
+    if exact:
+        mnu = interp.layer_mean(prof.get_layer_index('u'), pbot, ptop)
+        mnv = interp.layer_mean(prof.get_layer_index('v'), pbot, ptop)
+        return mnu-stu, mnv-stv
     if dp > 0: dp = -dp
-    ps = np.arange(pbot, ptop+dp, dp)
-    u, v = interp.components(prof, ps)
-    # u -= stu; v -= stv
+    ps = np.arange(pbot, ptop+dp, dp, dtype=np.float64)
+    u, v = interp.multi_pres(prof, ps, ('u', 'v'), monotonic=True)
     return u.mean()-stu, v.mean()-stv
 
 
-def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
+def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1, exact=False):
     '''
     Calculates a pressure-weighted mean storm-relative wind through a layer.
     The default layer is 850 to 200 hPa. This is a thin wrapper around
@@ -101,6 +122,11 @@ def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component of storm-motion vector
     dp : negative integer (optional; default -1)
         The pressure increment for the interpolated sounding
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind analytically over
+        the native levels of the data (exact) or averaging the
+        interpolated sounding at 'dp' pressure levels. With exact, pbot
+        and ptop may be arrays to average several layers at once.
 
     Returns
     -------
@@ -110,10 +136,12 @@ def sr_wind(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component
 
     '''
-    return mean_wind(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu, stv=stv)
+    return mean_wind(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu, stv=stv,
+                     exact=exact)
 
 
-def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
+def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1,
+                exact=False):
     '''
     Calculates a none-pressure-weighted mean storm-relative wind through a
     layer. The default layer is 850 to 200 hPa. This is a thin wrapper around
@@ -133,6 +161,11 @@ def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component of storm-motion vector
     dp : negative integer (optional; default -1)
         The pressure increment for the interpolated sounding
+    exact : bool (optional; default False)
+        Switch to choose between integrating the wind analytically over
+        the native levels of the data (exact) or averaging the
+        interpolated sounding at 'dp' pressure levels. With exact, pbot
+        and ptop may be arrays to average several layers at once.
 
     Returns
     -------
@@ -142,7 +175,8 @@ def sr_wind_npw(prof, pbot=850, ptop=250, stu=0, stv=0, dp=-1):
         V-component
 
     '''
-    return mean_wind_npw(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu, stv=stv)
+    return mean_wind_npw(prof, pbot=pbot, ptop=ptop, dp=dp, stu=stu,
+                         stv=stv, exact=exact)
 
 
 def wind_shear(prof, pbot=850, ptop=250):
@@ -173,6 +207,38 @@ def wind_shear(prof, pbot=850, ptop=250):
     return shu, shv
 
 
+def wind_shear_layers(prof, layers, agl=False):
+    '''
+    Calculates the shear through several layers at once, each equal to
+    wind_shear(prof, pbot, ptop). The winds at all of the bounds are
+    interpolated in a single call.
+
+    Parameters
+    ----------
+    prof: profile object
+        Profile object
+    layers : sequence of (bottom, top) pairs
+        Pressures (hPa) of the bottom and top levels of each layer, or
+        heights (m, AGL) if agl is True
+    agl : bool (optional; default False)
+        The layers are given as heights (m, AGL) instead of pressures
+
+    Returns
+    -------
+    shu : numpy array
+        U-component of each layer
+    shv : numpy array
+        V-component of each layer
+
+    '''
+    bounds = np.asarray(layers, dtype=np.float64).reshape(-1, 2)
+    if agl:
+        bounds = ma.filled(interp.pres(prof, interp.to_msl(prof, bounds)),
+                           np.nan)
+    u, v = interp.components(prof, bounds)
+    return u[:, 1] - u[:, 0], v[:, 1] - v[:, 0]
+
+
 def non_parcel_bunkers_motion(prof):
     '''
     Compute the Bunkers Storm Motion for a Right Moving Supercell
@@ -199,7 +265,7 @@ def non_parcel_bunkers_motion(prof):
     p6km = interp.pres(prof, msl6km)
 
     # SFC-6km Mean Wind
-    mnu6, mnv6 = mean_wind_npw(prof, prof.pres[prof.sfc], p6km)
+    mnu6, mnv6 = mean_wind_npw(prof, prof.pres[prof.sfc], p6km, exact=True)
 
     # SFC-6km Shear Vector
     shru6, shrv6 = wind_shear(prof, prof.pres[prof.sfc], p6km)
@@ -260,8 +326,8 @@ def helicity(prof, lower, upper, stu=0, stv=0, dp=-1, exact=True):
         u = np.concatenate([[u1], prof.u[ind1:ind2+1].compressed(), [u2]])
         v = np.concatenate([[v1], prof.v[ind1:ind2+1].compressed(), [v2]])
     else:
-        ps = np.arange(plower, pupper+dp, dp)
-        u, v = interp.components(prof, ps)
+        ps = np.arange(plower, pupper+dp, dp, dtype=np.float64)
+        u, v = interp.multi_pres(prof, ps, ('u', 'v'), monotonic=True)
     sru = utils.KTS2MS(u - stu)
     srv = utils.KTS2MS(v - stv)
     layers = (sru[1:] * srv[:-1]) - (sru[:-1] * srv[1:])
@@ -270,6 +336,159 @@ def helicity(prof, lower, upper, stu=0, stv=0, dp=-1, exact=True):
     return phel+nhel, phel, nhel
 
 
+def helicity_layers(prof, layers, stu=0, stv=0):
+    '''
+    Calculates the relative helicity (m2/s2) of several layers at once,
+    each equal to helicity(prof, lower, upper, stu, stv, exact=True). The
+    native levels and all of the layer bounds are merged into one profile,
+    the cumulative positive and negative helicity is computed along it
+    once, and every layer is read off as a difference of the cumulative
+    sums. Inserting a bound on a segment of the hodograph splits its
+    contribution without changing it, so each layer is unaffected by the
+    bounds of the others.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile Object
+    layers : sequence of (lower, upper) pairs
+        Bottom and top levels of each layer (m, AGL)
+    stu : number, numpy array (optional; default = 0)
+        U-component of storm-motion, or one per storm motion
+    stv : number, numpy array (optional; default = 0)
+        V-component of storm-motion, or one per storm motion
+
+    Returns
+    -------
+    phel+nhel : numpy array
+        Combined Helicity (m2/s2)
+    phel : numpy array
+        Positive Helicity (m2/s2)
+    nhel : numpy array
+        Negative Helicity (m2/s2)
+
+    Each has one value per layer, with a leading dimension for the storm
+    motions when stu and stv are arrays. Layers that extend outside of the
+    data are NaN.
+
+    '''
+    u, v, ibounds, valid = _hodograph_layers(prof, layers)
+    stu = np.asarray(stu, dtype=np.float64)
+    stv = np.asarray(stv, dtype=np.float64)
+    sru = utils.KTS2MS(u - stu[..., np.newaxis])
+    srv = utils.KTS2MS(v - stv[..., np.newaxis])
+    terms = (sru[..., 1:] * srv[..., :-1]) - (sru[..., :-1] * srv[..., 1:])
+    zero = np.zeros(terms.shape[:-1] + (1,))
+    cpos = np.concatenate([zero, np.cumsum(np.where(terms > 0, terms, 0.),
+                                           axis=-1)], axis=-1)
+    cneg = np.concatenate([zero, np.cumsum(np.where(terms < 0, terms, 0.),
+                                           axis=-1)], axis=-1)
+
+    phel = np.empty(stu.shape + valid.shape)
+    nhel = np.empty(stu.shape + valid.shape)
+    phel.fill(np.nan)
+    nhel.fill(np.nan)
+    top = ibounds[valid, 1]
+    bot = ibounds[valid, 0]
+    phel[..., valid] = cpos[..., top] - cpos[..., bot]
+    nhel[..., valid] = cneg[..., top] - cneg[..., bot]
+    return phel+nhel, phel, nhel
+
+
+def srh_map(prof, lower, upper, stu, stv, parts=False):
+    '''
+    Calculates the storm-relative helicity (m2/s2) of a layer for every
+    storm motion of a grid, each equal to helicity(prof, lower, upper,
+    stu, stv, exact=True). The helicity of each segment of the hodograph
+    is linear in the storm motion, so the total for the layer is
+
+        SRH = k**2 * (C + stu * dv - stv * du)
+
+    where C is the helicity relative to the ground, du and dv are the
+    changes of the wind across the layer and k converts knots to m/s. The
+    cost does not depend on the size of the grid. The positive and
+    negative parts are not linear in the storm motion, and requesting them
+    evaluates every segment for every storm motion.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile Object
+    lower : number
+        Bottom level of layer (m, AGL)
+    upper : number
+        Top level of layer (m, AGL)
+    stu : number, numpy array
+        U-components of the storm motions
+    stv : number, numpy array
+        V-components of the storm motions (broadcast against stu, e.g.
+        the output of np.meshgrid)
+    parts : bool (optional; default = False)
+        Also return the positive and negative helicity
+
+    Returns
+    -------
+    phel+nhel : numpy array
+        Combined Helicity (m2/s2) for each storm motion (NaN if the layer
+        extends outside of the data)
+    phel : numpy array
+        Positive Helicity (m2/s2); only returned if parts is True
+    nhel : numpy array
+        Negative Helicity (m2/s2); only returned if parts is True
+
+    '''
+    stu, stv = np.broadcast_arrays(np.asarray(stu, dtype=np.float64),
+                                   np.asarray(stv, dtype=np.float64))
+    u, v, ibounds, valid = _hodograph_layers(prof, [(lower, upper)])
+    if not valid[0]:
+        nan = np.empty(stu.shape)
+        nan.fill(np.nan)
+        return (nan, nan.copy(), nan.copy()) if parts else nan
+    u = u[ibounds[0, 0]:ibounds[0, 1]+1]
+    v = v[ibounds[0, 0]:ibounds[0, 1]+1]
+    if not parts:
+        hel = np.sum((u[1:] * v[:-1]) - (u[:-1] * v[1:]))
+        k = utils.KTS2MS(1.)
+        return k**2 * (hel + stu * (v[-1] - v[0]) - stv * (u[-1] - u[0]))
+    sru = utils.KTS2MS(u - stu[..., np.newaxis])
+    srv = utils.KTS2MS(v - stv[..., np.newaxis])
+    layers = (sru[..., 1:] * srv[..., :-1]) - (sru[..., :-1] * srv[..., 1:])
+    phel = np.where(layers > 0, layers, 0.).sum(axis=-1)
+    nhel = np.where(layers < 0, layers, 0.).sum(axis=-1)
+    return phel+nhel, phel, nhel
+
+
+def _hodograph_layers(prof, layers):
+    '''
+    Merges the native wind levels of the profile with the interpolated
+    winds at the bounds of the (lower, upper) AGL layers, ordered upward.
+    Returns the u and v components, the positions of the bounds of each
+    layer in them and whether each layer lies within the data (the bounds
+    of other layers are not included).
+
+    '''
+    bounds = np.asarray(layers, dtype=np.float64).reshape(-1, 2)
+    pbounds = ma.filled(interp.pres(prof, interp.to_msl(prof, bounds)),
+                        np.nan)
+    ubounds, vbounds = interp.components(prof, pbounds)
+    valid = np.isfinite(ubounds) & np.isfinite(vbounds)
+    valid = valid[:, 0] & valid[:, 1]
+
+    x, u = prof.get_interp_arrays('u')
+    xv, v = prof.get_interp_arrays('v')
+    if not np.array_equal(x, xv):
+        u, v = interp.multi_pres(prof, 10**x, ('u', 'v'))
+    logp = np.concatenate([x, np.log10(pbounds[valid]).ravel()])
+    u = np.concatenate([u, ubounds[valid].ravel()])
+    v = np.concatenate([v, vbounds[valid].ravel()])
+    order = np.argsort(-logp, kind='mergesort')
+    rank = np.empty(order.shape, dtype=np.intp)
+    rank[order] = np.arange(order.size)
+    ibounds = np.zeros(bounds.shape, dtype=np.intp)
+    ibounds[valid] = rank[x.size:].reshape(-1, 2)
+    return u[order], v[order], ibounds, valid
+
+
 def max_wind(prof, lower, upper, all=False):
     '''
     Finds the maximum wind speed of the layer given by lower and upper levels.
@@ -312,6 +531,98 @@ def max_wind(prof, lower, upper, all=False):
         return maxu[0], maxv[0], prof.pres[inds[0]]
 
 
+def max_wind_layers(prof, layers):
+    '''
+    Finds the maximum wind speed of several layers at once, each equal to
+    max_wind(prof, lower, upper). All of the bounds are converted to
+    pressure in one call and the maxima of every layer come from a single
+    np.maximum.reduceat over the (start, end) level indexes of the layers.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile Object
+    layers : sequence of (lower, upper) pairs
+        Bottom and top levels of each layer (m, AGL)
+
+    Returns
+    -------
+    maxu : numpy array
+        Maximum Wind Speed U-component of each layer
+    maxv : numpy array
+        Maximum Wind Speed V-component of each layer
+    p : numpy array
+        Pressure level (hPa) of max wind speed of each layer (the lowest
+        if it occurs at multiple levels)
+
+    Layers without any winds (e.g. extending outside of the data) are NaN.
+
+    '''
+    bounds = np.asarray(layers, dtype=np.float64).reshape(-1, 2)
+    pbounds = ma.filled(interp.pres(prof, interp.to_msl(prof, bounds)),
+                        np.nan)
+    pres = ma.filled(ma.asanyarray(prof.pres, dtype=np.float64), np.nan)
+    wspd = ma.filled(ma.asanyarray(prof.wspd, dtype=np.float64), -np.inf)
+    # Search the levels with a pressure; missing ones are skipped, as the
+    # comparisons in max_wind skip them. start is the first level above
+    # the bottom and end follows the last level below the top.
+    valid = np.append(np.nonzero(~np.isnan(pres))[0], pres.size)
+    negp = -pres[valid[:-1]]
+    plower = pbounds[:, 0]
+    pupper = pbounds[:, 1]
+    start = valid[np.searchsorted(negp, -plower, side='right')]
+    end = np.append(0, valid[:-1] + 1)[np.searchsorted(negp, -pupper)]
+    end[np.isnan(plower) | np.isnan(pupper)] = 0
+    mx, first, empty = _segment_max(wspd[np.newaxis, :],
+                                    start[np.newaxis, :], end[np.newaxis, :])
+    first = first[0]
+    empty = empty[0]
+    maxu = ma.filled(ma.asanyarray(prof.u, dtype=np.float64), np.nan)[first]
+    maxv = ma.filled(ma.asanyarray(prof.v, dtype=np.float64), np.nan)[first]
+    p = pres[first]
+    maxu[empty] = np.nan
+    maxv[empty] = np.nan
+    p[empty] = np.nan
+    return maxu, maxv, p
+
+
+def _segment_max(values, start, end):
+    '''
+    Maximum of each row of values (profiles, levels) from column start to
+    end (exclusive), with start and end of shape (profiles, layers). The
+    rows are flattened with a sentinel appended so that one
+    np.maximum.reduceat over the interleaved start and end indexes reduces
+    every segment. Also returns the first column within TOL of the maximum
+    (0 for empty segments) and whether each segment is empty (its maximum
+    is NaN).
+
+    '''
+    n = values.shape[1]
+    offset = np.arange(values.shape[0])[:, np.newaxis] * n
+    data = np.append(values.ravel(), -np.inf)
+    inds = np.empty(2 * start.size, dtype=np.intp)
+    inds[0::2] = (start + offset).ravel()
+    inds[1::2] = (end + offset).ravel()
+    mx = np.maximum.reduceat(data, inds)[0::2].reshape(start.shape)
+    empty = (end <= start) | np.isinf(mx)
+    mx[empty] = np.nan
+
+    # The non-empty segments are laid end to end on one flat axis and
+    # compared with their repeated maximum; a second reduceat then finds
+    # the first match in each, without a (profiles, layers, levels) array.
+    first = np.zeros(start.size, dtype=np.intp)
+    seg = np.nonzero(~empty.ravel())[0]
+    if seg.size:
+        length = (end - start).ravel()[seg]
+        head = np.cumsum(length) - length
+        local = np.arange(head[-1] + length[-1]) - np.repeat(head, length)
+        match = np.fabs(data[np.repeat(inds[0::2][seg], length) + local] -
+                        np.repeat(mx.ravel()[seg], length)) < TOL
+        local[~match] = n
+        first[seg] = start.ravel()[seg] + np.minimum.reduceat(local, head)
+    return mx, first.reshape(start.shape), empty
+
+
 def corfidi_mcs_motion(prof):
     '''
     Calculated the Meso-beta Elements (Corfidi) Vectors
@@ -334,11 +645,12 @@ def corfidi_mcs_motion(prof):
 
     '''
     # Compute the tropospheric (850hPa-300hPa) mean wind
-    mnu1, mnv1 = mean_wind_npw(prof, pbot=850., ptop=300.)
+    mnu1, mnv1 = mean_wind_npw(prof, pbot=850., ptop=300., exact=True)
 
     # Compute the low-level (SFC-1500m) mean wind
     p_1p5km = interp.pres(prof, interp.to_msl(prof, 1500.))
-    mnu2, mnv2 = mean_wind_npw(prof, prof.pres[prof.sfc], p_1p5km)
+    mnu2, mnv2 = mean_wind_npw(prof, prof.pres[prof.sfc], p_1p5km,
+                               exact=True)
 
     # Compute the upshear vector
     upu = mnu1 - mnu2
@@ -351,6 +663,67 @@ def corfidi_mcs_motion(prof):
     return upu, upv, dnu, dnv
 
 
+def kinematics(prof):
+    '''
+    Computes the standard bulk shears, mean winds and storm-motion vectors
+    of a profile together. The heights of all of the layers are converted
+    to pressure in one call, the winds at their bounds are interpolated in
+    one call and the mean winds come from the profile's cached layer
+    indexes, so the work shared by non_parcel_bunkers_motion and
+    corfidi_mcs_motion is only done once. Each entry equals the result of
+    the corresponding function.
+
+    Parameters
+    ----------
+    prof : profile object
+        Profile Object
+
+    Returns
+    -------
+    Dictionary with the (u, v) components of
+        'sfc_1km_shear', 'sfc_3km_shear', 'sfc_6km_shear' : bulk shear
+            from the surface to 1, 3 and 6 km AGL (wind_shear)
+        'sfc_1500m_mean', 'sfc_6km_mean', '850_300mb_mean' : exact
+            non-pressure-weighted mean winds (mean_wind_npw)
+    and the vectors
+        'bunkers' : (rstu, rstv, lstu, lstv) (non_parcel_bunkers_motion)
+        'corfidi' : (upu, upv, dnu, dnv) (corfidi_mcs_motion)
+
+    '''
+    psfc = prof.pres[prof.sfc]
+    p1km, p1500m, p3km, p6km = interp.pres(prof, interp.to_msl(prof,
+        np.asarray([1000., 1500., 3000., 6000.])))
+
+    # Winds at the surface and the tops of the shear layers
+    u, v = interp.components(prof, np.asarray([psfc, p1km, p3km, p6km]))
+    shear = dict(('sfc_%s_shear' % name, (u[i] - u[0], v[i] - v[0]))
+                 for i, name in ((1, '1km'), (2, '3km'), (3, '6km')))
+
+    # Mean winds through all of the layers in one lookup
+    pbot = np.asarray([psfc, psfc, 850.])
+    ptop = np.asarray([p1500m, p6km, 300.])
+    mnu, mnv = mean_wind_npw(prof, pbot, ptop, exact=True)
+
+    # Bunkers Right and Left Motion
+    d = utils.MS2KTS(7.5)     # Deviation value emperically derived as 7.5 m/s
+    shru6, shrv6 = shear['sfc_6km_shear']
+    tmp = d / utils.comp2vec(shru6, shrv6)[1]
+    bunkers = (mnu[1] + (tmp * shrv6), mnv[1] - (tmp * shru6),
+               mnu[1] - (tmp * shrv6), mnv[1] + (tmp * shru6))
+
+    # Corfidi upshear and downshear vectors
+    upu = mnu[2] - mnu[0]
+    upv = mnv[2] - mnv[0]
+    corfidi = (upu, upv, mnu[2] + upu, mnv[2] + upv)
+
+    kin = {'sfc_1500m_mean': (mnu[0], mnv[0]),
+           'sfc_6km_mean': (mnu[1], mnv[1]),
+           '850_300mb_mean': (mnu[2], mnv[2]),
+           'bunkers': bunkers, 'corfidi': corfidi}
+    kin.update(shear)
+    return kin
+
+
 def mbe_vectors(prof):
     '''
     Thin wrapper around corfidi_mcs_motion()
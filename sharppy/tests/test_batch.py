@@ -0,0 +1,169 @@
+import numpy as np
+import numpy.ma as ma
+import numpy.testing as npt
+import sharppy.sharptab.batch as batch
+import sharppy.sharptab.interp as interp
+import sharppy.sharptab.winds as winds
+from sharppy.sharptab.constants import MISSING
+from sharppy.sharptab.profile import Profile, ProfileBatch
+import test_profile as tp
+
+
+prof = tp.TestProfile().prof
+# A warmer copy of the test sounding that stops at 300 hPa
+top = prof.pres >= 300.
+prof2 = Profile(pres=prof.pres[top], hght=prof.hght[top],
+                tmpc=prof.tmpc[top] + 2., dwpc=prof.dwpc[top],
+                u=prof.u[top], v=prof.v[top])
+profs = [prof, prof2]
+pb = ProfileBatch.from_profiles(profs)
+
+
+def test_from_profiles():
+    npt.assert_equal(len(pb), 2)
+    npt.assert_equal(pb.nlev, [prof.pres.size, prof2.pres.size])
+    npt.assert_equal(pb.sfc, [prof.sfc, prof2.sfc])
+    npt.assert_(np.isnan(pb.tmpc[0, 0]))
+    npt.assert_(np.isnan(pb.pres[1, -1]))
+    npt.assert_almost_equal(pb.tmpc[1, 1:prof2.pres.size],
+                            prof2.tmpc[1:])
+
+
+def test_packing():
+    pres = [[1000., MISSING, 900., 800.], [950., 850., 750., 650.]]
+    hght = [[100., MISSING, 1000., 2000.], [500., 1400., 2400., 3500.]]
+    tmpc = [[20., MISSING, 15., 10.], [18., 12., 6., np.nan]]
+    wdir = [[180., MISSING, 200., 220.], [90., 90., 90., 90.]]
+    wspd = [[10., MISSING, 20., 30.], [5., MISSING, 15., 20.]]
+    pb2 = ProfileBatch(pres=pres, hght=hght, tmpc=tmpc, dwpc=tmpc,
+                       wdir=wdir, wspd=wspd)
+    npt.assert_equal(pb2.nlev, [3, 4])
+    npt.assert_almost_equal(pb2.pres[0, :3], [1000., 900., 800.])
+    npt.assert_(np.isnan(pb2.pres[0, 3]))
+    npt.assert_(np.isnan(pb2.u[1, 1]) and np.isnan(pb2.wdir[1, 1]))
+    npt.assert_almost_equal(pb2.u[0, 0], 0.)
+    npt.assert_almost_equal(pb2.v[0, 0], 10.)
+
+
+def test_from_profiles_empty():
+    npt.assert_raises_regex(ValueError, 'at least one profile',
+                            ProfileBatch.from_profiles, [])
+
+
+def test_cache_invalidation():
+    pb2 = ProfileBatch.from_profiles(profs)
+    input_p = np.asarray([[900., 500.]])
+    old_t = batch.temp(pb2, input_p)
+    old_vt = pb2.get_vtmp_profile()
+    # In-place edits would go behind the cache, so they are refused
+    npt.assert_raises(ValueError, pb2.tmpc.__setitem__, (0, 1), 0.)
+    # Assigning new data discards everything derived from the old data
+    pb2.tmpc = pb2.tmpc + 5.
+    npt.assert_(not pb2.tmpc.flags.writeable)
+    npt.assert_almost_equal(batch.temp(pb2, input_p), old_t + 5.)
+    npt.assert_(np.nanmin(pb2.get_vtmp_profile() - old_vt) > 4.)
+
+
+def test_get_profile():
+    returned = pb.get_profile(1)
+    npt.assert_almost_equal(returned.pres, prof2.pres)
+    npt.assert_almost_equal(returned.tmpc, prof2.tmpc)
+    npt.assert_equal(returned.tmpc.mask, prof2.tmpc.mask)
+    npt.assert_almost_equal(returned.wspd, prof2.wspd)
+    npt.assert_equal(returned.sfc, prof2.sfc)
+
+
+def test_interp():
+    input_p = np.asarray([975., 900., 600., 400., 250.])
+    returned_t = batch.temp(pb, input_p[np.newaxis, :])
+    returned_h = batch.hght(pb, input_p[np.newaxis, :])
+    returned_u, returned_v = batch.components(pb, input_p[np.newaxis, :])
+    returned_vt = batch.vtmp(pb, input_p[np.newaxis, :])
+    for i, pr in enumerate(profs):
+        npt.assert_almost_equal(returned_t[i], interp.temp(pr, input_p))
+        npt.assert_almost_equal(returned_h[i], interp.hght(pr, input_p))
+        correct_u, correct_v = interp.components(pr, input_p)
+        npt.assert_almost_equal(returned_u[i], correct_u)
+        npt.assert_almost_equal(returned_v[i], correct_v)
+        npt.assert_almost_equal(returned_vt[i], interp.vtmp(pr, input_p))
+    npt.assert_(np.isnan(returned_t[1, -1]))
+
+    # one level per profile
+    returned_t = batch.temp(pb, [900., 800.])
+    npt.assert_almost_equal(returned_t, [interp.temp(prof, 900.),
+                                         interp.temp(prof2, 800.)])
+
+
+def test_pres_msl():
+    input_z = np.asarray([1000., 3000., 6000.])
+    msl = batch.to_msl(pb, input_z[np.newaxis, :])
+    returned_p = batch.pres(pb, msl)
+    for i, pr in enumerate(profs):
+        npt.assert_almost_equal(msl[i], interp.to_msl(pr, input_z))
+        npt.assert_almost_equal(returned_p[i],
+                                interp.pres(pr, interp.to_msl(pr, input_z)))
+    npt.assert_almost_equal(batch.to_agl(pb, msl), [input_z, input_z])
+
+
+def test_wind_shear():
+    returned_u, returned_v = batch.wind_shear(pb, pbot=pb.pres[:, 1],
+                                              ptop=500.)
+    for i, pr in enumerate(profs):
+        ubot, vbot = interp.components(pr, pr.pres[1])
+        utop, vtop = interp.components(pr, 500.)
+        npt.assert_almost_equal(returned_u[i], utop - ubot)
+        npt.assert_almost_equal(returned_v[i], vtop - vbot)
+
+
+def test_mean_wind():
+    input_pbot = [850., 900.]
+    input_ptop = np.asarray([[500., 300.], [400., 700.]])
+    returned_u, returned_v = batch.mean_wind(pb, input_pbot, input_ptop)
+    returned_npw = batch.mean_wind_npw(pb, input_pbot, input_ptop)
+    for i, pr in enumerate(profs):
+        correct_u, correct_v = winds.mean_wind(pr, input_pbot[i],
+                                               input_ptop[i], exact=True)
+        npt.assert_almost_equal(returned_u[i], correct_u)
+        npt.assert_almost_equal(returned_v[i], correct_v)
+        correct_u, correct_v = winds.mean_wind_npw(pr, input_pbot[i],
+                                                   input_ptop[i], exact=True)
+        npt.assert_almost_equal(returned_npw[0][i], correct_u)
+        npt.assert_almost_equal(returned_npw[1][i], correct_v)
+    npt.assert_(np.isnan(batch.mean_wind(pb)[0][1]))
+
+
+def test_non_parcel_bunkers_motion():
+    returned = batch.non_parcel_bunkers_motion(pb)
+    for i, pr in enumerate(profs):
+        correct = winds.non_parcel_bunkers_motion(pr)
+        npt.assert_almost_equal([r[i] for r in returned], correct)
+
+
+def test_max_wind():
+    layers = [(0., 3000.), (3000., 9000.), (0., 30000.), (-500., 3000.)]
+    returned = batch.max_wind(pb, layers)
+    npt.assert_equal(returned[0].shape, (2, 4))
+    for i, pr in enumerate(profs):
+        correct = winds.max_wind_layers(pr, layers)
+        for r, c in zip(returned, correct):
+            npt.assert_almost_equal(r[i], c)
+    npt.assert_(np.isnan(returned[0][1, 2]))
+    # a bound below the ground is outside of the data
+    npt.assert_(np.all(np.isnan([r[:, 3] for r in returned])))
+
+
+def test_wind_shear_layers():
+    layers = [(0., 1000.), (0., 6000.), (0., 9000.)]
+    returned = batch.wind_shear_layers(pb, layers, agl=True)
+    npt.assert_equal(returned[0].shape, (2, 3))
+    for i, pr in enumerate(profs):
+        correct = winds.wind_shear_layers(pr, layers, agl=True)
+        for r, c in zip(returned, correct):
+            npt.assert_almost_equal(r[i], c)
+    npt.assert_(np.isnan(returned[0][1, 2]))
+
+    layers = [[(850., 250.)], [(900., 500.)]]
+    returned = batch.wind_shear_layers(pb, layers)
+    for i, pr in enumerate(profs):
+        correct = winds.wind_shear(pr, *layers[i][0])
+        npt.assert_almost_equal([r[i, 0] for r in returned], correct)
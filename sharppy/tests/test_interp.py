@@ -73,6 +73,9 @@ def test_vtmp():
     returned_v = interp.vtmp(prof, input_p)
     npt.assert_almost_equal(returned_v, correct_v)
 
+    returned_v = interp.vtmp(prof, input_p, cached=True)
+    npt.assert_almost_equal(returned_v, correct_v, decimal=2)
+
 
 def test_components():
     input_p = 900
@@ -133,3 +136,105 @@ def test_to_msl():
 
 
 
+
+
+def test_layer_mean():
+    index = interp.layer_index(prof.pres, prof.u)
+    input_pbot = 850.
+    input_ptop = 250.
+    correct_u = 31.843605953676942
+    returned_u = interp.layer_mean(index, input_pbot, input_ptop)
+    npt.assert_almost_equal(returned_u, correct_u)
+
+    correct_u = 27.38084061629449
+    returned_u = interp.layer_mean(index, input_pbot, input_ptop,
+                                   weighted=True)
+    npt.assert_almost_equal(returned_u, correct_u)
+
+    # a layer entirely between two levels has the mean of the interpolated
+    # field over that layer
+    input_pbot = [850., 976., 1100.]
+    input_ptop = [250., 970., 500.]
+    correct_u = [31.843605953676942, interp.components(prof, 973.)[0],
+                 np.nan]
+    returned_u = interp.layer_mean(index, input_pbot, input_ptop)
+    npt.assert_almost_equal(returned_u, correct_u, decimal=4)
+
+
+def test_multi_pres():
+    input_p = np.asarray([1100., 900., 800., 600., 400., 5.])
+    fields = ('tmpc', 'dwpc', 'u', 'v', 'hght')
+    returned = interp.multi_pres(prof, input_p, fields)
+    correct = [interp.temp(prof, input_p), interp.dwpt(prof, input_p)]
+    correct += list(interp.components(prof, input_p))
+    correct.append(interp.hght(prof, input_p))
+    for r, c in zip(returned, correct):
+        npt.assert_almost_equal(r, c)
+    assert np.isnan(returned[0][0]) and np.isnan(returned[0][-1])
+
+    returned_t = interp.multi_pres(prof, 900., ('tmpc',))[0]
+    npt.assert_almost_equal(returned_t, interp.temp(prof, 900.))
+    assert np.ndim(returned_t) == 0
+
+
+def test_multi_hght():
+    input_z = np.asarray([1000., 3000., 6000.])
+    returned_logp, returned_u = interp.multi_hght(prof, input_z, ('logp', 'u'))
+    npt.assert_almost_equal(10**returned_logp, interp.pres(prof, input_z))
+    mask = prof.hght.mask | prof.u.mask
+    correct_u = np.interp(input_z, prof.hght.data[~mask], prof.u.data[~mask])
+    npt.assert_almost_equal(returned_u, correct_u)
+
+
+def test_layer_mean_hght():
+    # the mean height of a layer is its midpoint
+    index = interp.layer_index_hght(prof.hght, prof.hght)
+    input_hbot = np.asarray([357., 1000., 2500.])
+    input_htop = np.asarray([1000., 6000., 2600.])
+    returned = interp.layer_mean_hght(index, input_hbot, input_htop)
+    npt.assert_almost_equal(returned, (input_hbot + input_htop) / 2.)
+
+    index = interp.layer_index_hght(prof.hght, prof.u)
+    input_h = np.linspace(1000., 6000., 50001)
+    mask = prof.hght.mask | prof.u.mask
+    correct_u = np.interp(input_h, prof.hght.data[~mask], prof.u.data[~mask])
+    returned_u = interp.layer_mean_hght(index, 1000., 6000.)
+    npt.assert_almost_equal(returned_u, correct_u.mean(), decimal=3)
+    npt.assert_(np.isnan(interp.layer_mean_hght(index, 0., 1000.)))
+
+
+def test_regrid():
+    grid = interp.regrid(prof, 1000., 100., 25.)
+    correct_p = np.arange(1000., 75., -25.)
+    npt.assert_almost_equal(grid.pres, correct_p)
+    npt.assert_(grid.tmpc.mask[0])
+    npt.assert_almost_equal(grid.tmpc[1:], interp.temp(prof, correct_p[1:]))
+    npt.assert_almost_equal(grid.hght[1:], interp.hght(prof, correct_p[1:]))
+    correct_u, correct_v = interp.components(prof, correct_p[1:])
+    npt.assert_almost_equal(grid.u[1:], correct_u)
+    npt.assert_almost_equal(grid.v[1:], correct_v)
+    again = interp.regrid(prof, 1000, 100, -25)
+    npt.assert_(again is not grid)
+    npt.assert_almost_equal(again.tmpc, grid.tmpc)
+
+    # only the most recently used grids are kept
+    for step in range(1, 2 * interp.REGRID_CACHE_SIZE):
+        interp.regrid(prof, 1000., 900., step)
+    npt.assert_equal(len(prof._cache['regrid']), interp.REGRID_CACHE_SIZE)
+
+    grid = interp.regrid(prof, 0., 6000., 250., coord='hght')
+    correct_h = interp.to_msl(prof, np.arange(0., 6250., 250.))
+    npt.assert_almost_equal(grid.hght, correct_h)
+    npt.assert_almost_equal(grid.pres, interp.pres(prof, correct_h))
+    npt.assert_almost_equal(grid.tmpc, interp.temp(prof, grid.pres))
+    npt.assert_equal(grid.sfc, 0)
+
+
+def test_multi_pres_monotonic():
+    fields = ('hght', 'tmpc', 'dwpc', 'u', 'v')
+    for input_p in [np.arange(1050., 5., -1.), np.arange(5., 1050., 0.5),
+                    np.asarray([900., 900., 850.]), np.asarray([2000., 1.])]:
+        correct = interp.multi_pres(prof, input_p, fields)
+        returned = interp.multi_pres(prof, input_p, fields, monotonic=True)
+        for r, c in zip(returned, correct):
+            npt.assert_almost_equal(r, c)
@@ -0,0 +1,119 @@
+import numpy as np
+import numpy.ma as ma
+import numpy.testing as npt
+import sharppy.sharptab.params as params
+import sharppy.sharptab.thermo as thermo
+from sharppy.sharptab.profile import Profile
+import test_profile
+
+
+prof = test_profile.TestProfile().prof
+
+
+def test_parcel_trace():
+    pcl = params.parcel_trace(prof)
+    npt.assert_almost_equal(pcl.lclpres, 879.8949707815297)
+    npt.assert_almost_equal(pcl.lcltemp, 13.58084197)
+    npt.assert_(pcl.ttrace.mask[0])
+
+    # below the LCL the parcel follows the dry adiabat
+    dry = (prof.pres <= prof.pres[prof.sfc]) & (prof.pres >= pcl.lclpres)
+    correct_t = thermo.theta(1000., thermo.theta(976., 22.2), prof.pres[dry])
+    npt.assert_almost_equal(pcl.ttrace[dry], correct_t)
+
+    # above the LCL it matches lifting to each level separately
+    inds = [10, 30, 60, 100]
+    correct_t = [thermo.lifted(976., 22.2, 15.2, prof.pres[i]) for i in inds]
+    correct_vt = [thermo.virtemp(prof.pres[i], t, t) for i, t in
+                  zip(inds, correct_t)]
+    npt.assert_almost_equal(pcl.ttrace[inds], correct_t)
+    npt.assert_almost_equal(pcl.vtrace[inds], correct_vt)
+
+
+def test_parcel_trace_elevated():
+    pcl = params.parcel_trace(prof, pres=850., tmpc=10.6, dwpc=9.5)
+    npt.assert_(pcl.ttrace.mask[:9].all())
+    npt.assert_almost_equal(pcl.ttrace[9], 10.6)
+    correct_t = thermo.lifted(850., 10.6, 9.5, 500.)
+    npt.assert_almost_equal(pcl.ttrace[27], correct_t)
+
+
+def test_lift_parcels():
+    input_p = [976., 850., 700.]
+    input_t = [22.2, 10.6, 3.]
+    input_td = [15.2, 9.5, -6.]
+    returned = params.lift_parcels(input_p, input_t, input_td, prof.pres)
+    npt.assert_equal(returned.shape, (3, len(prof.pres)))
+    for i in range(3):
+        correct = params.parcel_trace(prof, input_p[i], input_t[i],
+                                      input_td[i]).ttrace
+        npt.assert_equal(returned.mask[i], correct.mask)
+        npt.assert_almost_equal(returned[i].compressed(), correct.compressed())
+
+    input_lev = [1000., 900., 500., 100.]
+    returned = params.lift_parcels(950., 30., 25., input_lev)
+    npt.assert_(returned.mask[0, 0])
+    npt.assert_almost_equal(returned[0, 3], -79.05621246586672)
+
+
+def test_parcelx():
+    pcl = params.parcelx(prof)
+    correct = [2391.5848863902406, 0., 879.8949707815297, 192.36436283851805]
+    returned = [pcl.bplus, pcl.bminus, pcl.lfcpres, pcl.elpres]
+    npt.assert_almost_equal(returned, correct, decimal=4)
+
+    pcl = params.parcelx(prof, pres=850., tmpc=10.6, dwpc=9.5)
+    correct = [825.4385629781463, -65.83520155641378, 668.9737214700126,
+               216.8349292736251]
+    returned = [pcl.bplus, pcl.bminus, pcl.lfcpres, pcl.elpres]
+    npt.assert_almost_equal(returned, correct, decimal=4)
+
+
+def test_parcelx_no_lfc():
+    pcl = params.parcelx(prof, pres=500., tmpc=-17.9, dwpc=-22.9)
+    npt.assert_equal([pcl.bplus, pcl.bminus], [0., 0.])
+    npt.assert_(pcl.lfcpres is ma.masked)
+    npt.assert_(pcl.elpres is ma.masked)
+
+
+def test_most_unstable_level():
+    correct_p = 976.
+    returned_p = params.most_unstable_level(prof)
+    npt.assert_almost_equal(returned_p, correct_p)
+
+    correct_p = 850.
+    returned_p = params.most_unstable_level(prof, pbot=850., ptop=500.)
+    npt.assert_almost_equal(returned_p, correct_p)
+
+
+def test_mean_theta():
+    correct_theta = 23.438893249950933
+    returned_theta = params.mean_theta(prof)
+    npt.assert_almost_equal(returned_theta, correct_theta)
+
+    correct_theta = [23.438893249950933, params.mean_theta(prof, 976., 926.)]
+    returned_theta = params.mean_theta(prof, 976., [876., 926.])
+    npt.assert_almost_equal(returned_theta, correct_theta)
+
+
+def test_mean_mixratio():
+    correct_w = 9.826160240495883
+    returned_w = params.mean_mixratio(prof)
+    npt.assert_almost_equal(returned_w, correct_w)
+
+    # the integrals are reused from the profile cache
+    index = prof.get_layer_index('mixratio')
+    npt.assert_(prof.get_layer_index('mixratio') is index)
+    npt.assert_almost_equal(params.mean_mixratio(prof), correct_w)
+
+
+def test_mixed_layer_parcel():
+    correct = [976., 21.3874658257202, 13.24182290609889]
+    returned = params.mixed_layer_parcel(prof)
+    npt.assert_almost_equal(returned, correct)
+
+    returned_p, returned_t, returned_td = \
+        params.mixed_layer_parcel(prof, [50., 100.])
+    npt.assert_almost_equal(returned_p, [976., 976.])
+    npt.assert_almost_equal(returned_t[1], 21.3874658257202)
+    npt.assert_almost_equal(returned_td[1], 13.24182290609889)
@@ -1,6 +1,6 @@
 import numpy as np
 import numpy.ma as ma
-from sharppy.sharptab import constants
+from sharppy.sharptab import constants, thermo, interp
 from sharppy.sharptab.constants import MISSING
 from sharppy.sharptab.profile import Profile
 import numpy.testing as npt
@@ -208,3 +208,114 @@ class TestProfile(object):
         npt.assert_almost_equal(prof.sfc, sfc_ind)
 
 
+prof = Profile(pres=pres, hght=hght, tmpc=tmpc, dwpc=dwpc, wdir=wdir,
+               wspd=wspd)
+
+
+def test_interp_arrays():
+    x, y = prof.get_interp_arrays('u')
+    correct_y = prof.u[::-1].compressed()
+    correct_x = prof.logp[::-1][~prof.u[::-1].mask]
+    npt.assert_(np.all(np.diff(x) >= 0))
+    npt.assert_almost_equal(x, correct_x)
+    npt.assert_almost_equal(y, correct_y)
+    npt.assert_(prof.get_interp_arrays('u') is
+                prof.get_interp_arrays('u'))
+
+    x, y = prof.get_interp_arrays('logp', coord='hght')
+    npt.assert_almost_equal(x, prof.hght.compressed())
+
+
+def test_vtmp_profile():
+    returned = prof.get_vtmp_profile()
+    npt.assert_(returned.mask[0])
+    correct = [thermo.virtemp(p, t, td) for p, t, td in
+               zip(pres[1:], tmpc[1:], dwpc[1:])]
+    npt.assert_almost_equal(returned[1:], correct)
+    npt.assert_(prof.get_vtmp_profile() is returned)
+    x, y = prof.get_interp_arrays('vtmp')
+    npt.assert_almost_equal(y[::-1], returned.compressed())
+
+
+def test_thetae_profile():
+    returned = prof.get_thetae_profile()
+    npt.assert_(returned.mask[0])
+    correct = [thermo.thetae(p, t, td) for p, t, td in
+               zip(pres[1:], tmpc[1:], dwpc[1:])]
+    npt.assert_almost_equal(returned[1:], correct)
+    npt.assert_(prof.get_thetae_profile() is returned)
+
+
+def test_thetaw_profile():
+    returned = prof.get_thetaw_profile()
+    npt.assert_(returned.mask[0])
+    correct = [thermo.thetaw(p, t, td) for p, t, td in
+               zip(pres[1:], tmpc[1:], dwpc[1:])]
+    npt.assert_almost_equal(returned[1:], correct)
+
+
+def test_layer_index():
+    returned = prof.get_layer_index('u')
+    correct = interp.layer_index(prof.pres, prof.u)
+    for r, c in zip(returned, correct):
+        npt.assert_almost_equal(r, c)
+    npt.assert_(prof.get_layer_index('u') is returned)
+    returned = prof.get_layer_index('tmpc', coord='hght')
+    correct = interp.layer_index_hght(prof.hght, prof.tmpc)
+    for r, c in zip(returned, correct):
+        npt.assert_almost_equal(r, c)
+
+
+def test_wetbulb_profile():
+    returned = prof.get_wetbulb_profile()
+    npt.assert_(returned.mask[0])
+    correct = [thermo.wetbulb(p, t, td) for p, t, td in
+               zip(pres[1:], tmpc[1:], dwpc[1:])]
+    npt.assert_almost_equal(returned[1:], correct)
+    npt.assert_(prof.get_wetbulb_profile() is returned)
+
+
+def test_theta_profile():
+    returned = prof.get_theta_profile()
+    npt.assert_(returned.mask[0])
+    correct = [thermo.theta(p, t) for p, t in zip(pres[1:], tmpc[1:])]
+    npt.assert_almost_equal(returned[1:], correct)
+    npt.assert_(prof.get_theta_profile() is returned)
+
+
+def test_mixratio_profile():
+    returned = prof.get_mixratio_profile()
+    npt.assert_(returned.mask[0])
+    correct = [thermo.mixratio(p, td) for p, td in zip(pres[1:], dwpc[1:])]
+    npt.assert_almost_equal(returned[1:], correct)
+    npt.assert_(prof.get_mixratio_profile() is returned)
+
+
+def test_cache_invalidation():
+    edit = Profile(pres=pres.copy(), hght=hght.copy(), tmpc=tmpc.copy(),
+                   dwpc=dwpc.copy(), wdir=wdir.copy(), wspd=wspd.copy())
+    vtmp = edit.get_vtmp_profile()
+    temp = interp.temp(edit, 700.)
+    index = edit.get_layer_index('tmpc')
+    npt.assert_(edit.get_vtmp_profile() is vtmp)
+
+    # editing a level in place rebuilds everything derived from it
+    i = np.where(edit.pres == 700.)[0][0]
+    edit.tmpc[i] += 5.
+    npt.assert_almost_equal(interp.temp(edit, 700.), temp + 5.)
+    npt.assert_almost_equal(edit.get_vtmp_profile()[i],
+                            thermo.virtemp(700., edit.tmpc[i], edit.dwpc[i]))
+    npt.assert_(edit.get_layer_index('tmpc') is not index)
+    npt.assert_almost_equal(edit.get_layer_index('tmpc')[1],
+                            interp.layer_index(edit.pres, edit.tmpc)[1])
+
+    # so does masking a level, or replacing the array
+    edit.tmpc[i] = ma.masked
+    npt.assert_(edit.get_vtmp_profile().mask[i])
+    edit.tmpc = tmpc.copy()
+    npt.assert_almost_equal(interp.temp(edit, 700.), temp)
+
+    # unrelated edits keep the cached values
+    vtmp = edit.get_vtmp_profile()
+    edit.u[i] += 5.
+    npt.assert_(edit.get_vtmp_profile() is vtmp)
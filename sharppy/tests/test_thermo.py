@@ -211,6 +211,7 @@ def test_theta():
     correct_theta = 9.961049492262532
     returned_theta = thermo.theta(input_p, input_t, input_p2)
     npt.assert_almost_equal(returned_theta, correct_theta)
+    npt.assert_(isinstance(returned_theta, float))
 
     # array
     input_p = np.asarray([940, 850])
@@ -294,8 +295,90 @@ def test_satlift():
     returned_t = thermo.satlift(input_p, input_thetam)
     npt.assert_almost_equal(returned_t, correct_t)
 
+    # array_like pass
+    input_p = np.asarray([850, 1000, 500, 200])
+    input_thetam = np.asarray([20, 20, -5, 30])
+    correct_t = [thermo.satlift(pp, th) for pp, th in
+                 zip(input_p, input_thetam)]
+    returned_t = thermo.satlift(input_p, input_thetam)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    # broadcast pass
+    input_p = np.asarray([[850, 700], [500, 300]])
+    input_thetam = 20
+    correct_t = [[thermo.satlift(850, 20), thermo.satlift(700, 20)],
+                 [thermo.satlift(500, 20), thermo.satlift(300, 20)]]
+    returned_t = thermo.satlift(input_p, input_thetam)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    # masked array_like pass
+    input_p = ma.asanyarray([850., 700., 500.])
+    input_p[1] = ma.masked
+    input_thetam = 20
+    returned_t = thermo.satlift(input_p, input_thetam)
+    npt.assert_(returned_t.mask[1])
+    npt.assert_almost_equal(returned_t[[0, 2]],
+                            [13.712979340608157, thermo.satlift(500, 20)])
+
+
+def _use_tmp_table(monkeypatch, tmpdir):
+    # Keep the table cache out of the real home directory
+    monkeypatch.setattr(thermo, 'SATLIFT_TABLE_PATH',
+                        str(tmpdir.join('satlift_table.npz')))
+    monkeypatch.setattr(thermo, '_satlift_table', None)
+
+
+def test_satlift_table(monkeypatch, tmpdir):
+    _use_tmp_table(monkeypatch, tmpdir)
+    logp, thm, temps = thermo.satlift_table()
+    npt.assert_(tmpdir.join('satlift_table.npz').check())
+    npt.assert_equal(tmpdir.listdir(), [tmpdir.join('satlift_table.npz')])
+    npt.assert_equal(temps.shape, (thermo.SATLIFT_TABLE_NPRES,
+                                   thermo.SATLIFT_TABLE_NTHM))
+    npt.assert_(thermo.satlift_table() is thermo.satlift_table())
+
+    # cached file is loaded
+    path = str(tmpdir.join('copy.npz'))
+    np.savez(path, version=thermo.SATLIFT_TABLE_VERSION, logp=logp,
+             thetam=thm, temps=np.zeros_like(temps))
+    npt.assert_equal(thermo.satlift_table(path=path)[2], 0)
+
+    # stale version is rebuilt
+    np.savez(path, version=thermo.SATLIFT_TABLE_VERSION - 1, logp=logp,
+             thetam=thm, temps=np.zeros_like(temps))
+    npt.assert_almost_equal(thermo.satlift_table(path=path)[2], temps)
+    npt.assert_almost_equal(np.load(path)['temps'], temps)
+
+    # truncated file is rebuilt
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    npt.assert_almost_equal(thermo.satlift_table(path=path)[2], temps)
+    with open(path, 'wb') as f:
+        f.write(data[-100:])
+    npt.assert_almost_equal(thermo.satlift_table(path=path)[2], temps)
+
+
+def test_satlift_lookup(monkeypatch, tmpdir):
+    _use_tmp_table(monkeypatch, tmpdir)
+    input_p = 850
+    input_thetam = 20
+    correct_t = 13.712979340608157
+    returned_t = thermo.satlift_lookup(input_p, input_thetam)
+    npt.assert_allclose(returned_t, correct_t, atol=0.05)
 
-def test_wetlift():
+    # array_like pass, including values outside of the table
+    input_p = np.asarray([1050, 850, 500, 300, 100, 20])
+    input_thetam = np.asarray([25, 20, 15, -10, 30, 10])
+    correct_t = thermo.satlift(input_p, input_thetam)
+    returned_t = thermo.satlift_lookup(input_p, input_thetam)
+    npt.assert_allclose(returned_t, correct_t, atol=0.05)
+    npt.assert_equal(returned_t[-1], correct_t[-1])
+
+
+def test_wetlift(monkeypatch, tmpdir):
+    _use_tmp_table(monkeypatch, tmpdir)
     input_p = 700
     input_t = 15
     input_p2 = 100
@@ -303,6 +386,16 @@ def test_wetlift():
     returned_t = thermo.wetlift(input_p, input_t, input_p2)
     npt.assert_almost_equal(returned_t, correct_t)
 
+    input_p = np.asarray([700, 850])
+    input_t = np.asarray([15, 10])
+    input_p2 = 100
+    correct_t = [-81.27400812504021, thermo.wetlift(850, 10, 100)]
+    returned_t = thermo.wetlift(input_p, input_t, input_p2)
+    npt.assert_almost_equal(returned_t, correct_t)
+
+    returned_t = thermo.wetlift(input_p, input_t, input_p2, table=True)
+    npt.assert_allclose(returned_t, correct_t, atol=0.05)
+
 
 def test_lifted():
     input_p = 950
@@ -375,6 +468,15 @@ def test_wetbulb():
     returned_t = thermo.wetbulb(input_p, input_t, input_td)
     npt.assert_almost_equal(returned_t, correct_t)
 
+    input_p = ma.asanyarray([950, 1013, 900])
+    input_t = ma.asanyarray([5, 5, 0])
+    input_td = ma.asanyarray([-10, -10, 0])
+    input_td[2] = ma.masked
+    correct_t = [-0.04811002960985089, 0.22705033380623352]
+    returned_t = thermo.wetbulb(input_p, input_t, input_td)
+    npt.assert_almost_equal(returned_t[:2], correct_t)
+    npt.assert_(returned_t.mask[2])
+
 
 def test_thetaw():
     input_p = 925
@@ -407,6 +509,13 @@ def test_thetae():
     returned_t = thermo.thetae(input_p, input_t, input_td)
     npt.assert_almost_equal(returned_t, correct_t)
 
+    input_p = np.asarray([925, 950])
+    input_t = np.asarray([7, 20])
+    input_td = np.asarray([3, 14])
+    correct_t = [28.864469418729357, 57.68849564698746]
+    returned_t = thermo.thetae(input_p, input_t, input_td)
+    npt.assert_almost_equal(returned_t, correct_t)
+
 
 def test_virtemp():
     input_p = 925
@@ -0,0 +1,89 @@
+''' Parity of the numpy and numba thermo backends '''
+from unittest import SkipTest
+import numpy as np
+import numpy.ma as ma
+import numpy.testing as npt
+import sharppy.sharptab.thermo as thermo
+
+
+np.random.seed(42)
+pres = np.random.uniform(100., 1050., 2000)
+tmpc = np.random.uniform(-60., 40., 2000)
+dwpc = tmpc - np.random.uniform(0., 30., 2000)
+thetam = np.random.uniform(-30., 40., 2000)
+
+
+def compare(func, *args):
+    try:
+        thermo.set_backend('numba')
+    except ImportError:
+        raise SkipTest('numba is not installed')
+    try:
+        returned = func(*args)
+        thermo.set_backend('numpy')
+        correct = func(*args)
+    finally:
+        thermo.set_backend()
+    npt.assert_equal(ma.getmaskarray(returned), ma.getmaskarray(correct))
+    npt.assert_allclose(ma.filled(returned, 0.), ma.filled(correct, 0.),
+                        rtol=1e-12, atol=1e-10)
+
+
+def test_wobf():
+    compare(thermo.wobf, tmpc)
+
+
+def test_satlift():
+    compare(thermo.satlift, pres, thetam)
+
+    # masked elements stay masked with both backends
+    input_p = ma.asanyarray(pres)
+    input_p[::3] = ma.masked
+    compare(thermo.satlift, input_p, thetam)
+
+
+def test_vappres():
+    compare(thermo.vappres, tmpc)
+
+
+def test_mixratio():
+    compare(thermo.mixratio, pres, dwpc)
+
+
+def test_lcltemp():
+    compare(thermo.lcltemp, tmpc, dwpc)
+
+
+def test_wetlift():
+    compare(thermo.wetlift, pres, tmpc, 200.)
+
+
+def test_thetae():
+    compare(thermo.thetae, pres, tmpc, dwpc)
+
+
+def test_virtemp():
+    compare(thermo.virtemp, pres, tmpc, dwpc)
+
+
+def test_masked():
+    # Profile data is masked; the kernels run on the unmasked elements
+    input_p = ma.asanyarray(pres)
+    input_p[::3] = ma.masked
+    input_t = ma.asanyarray(tmpc)
+    input_t[1::5] = ma.masked
+    compare(thermo.wobf, input_t)
+    compare(thermo.vappres, input_t)
+    compare(thermo.mixratio, input_p, dwpc)
+    compare(thermo.lcltemp, input_t, dwpc)
+    compare(thermo.thetae, input_p, input_t, dwpc)
+    compare(thermo.virtemp, input_p, input_t, dwpc)
+
+    thermo.set_backend('numba')
+    try:
+        npt.assert_(isinstance(thermo.mixratio(input_p, dwpc),
+                               ma.MaskedArray))
+        npt.assert_(not isinstance(thermo.mixratio(pres, dwpc),
+                                   ma.MaskedArray))
+    finally:
+        thermo.set_backend()
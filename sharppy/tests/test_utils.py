@@ -16,6 +16,16 @@ def test_vec2comp_single():
     npt.assert_almost_equal(returned_u, correct_u)
     npt.assert_almost_equal(returned_v, correct_v)
 
+def test_vec2comp_single_matches_array():
+    input_wdir = [0, 45, 90, 135, 180, 225, 270, 315, 360, 17.5]
+    input_wspd = [5, 10, 15, 20, 25, 30, 35, 40, 45, 12.3]
+    correct_u, correct_v = utils.vec2comp(input_wdir, input_wspd)
+    for i in range(len(input_wdir)):
+        returned_u, returned_v = utils.vec2comp(input_wdir[i], input_wspd[i])
+        npt.assert_(isinstance(returned_u, float))
+        npt.assert_equal(returned_u, correct_u[i])
+        npt.assert_equal(returned_v, correct_v[i])
+
 def test_vec2comp_array_like():
     input_wdir = [0, 45, 90, 135, 180, 225, 270, 315, 360]
     input_wspd = [5, 10, 15, 20, 25, 30, 35, 40, 45]
@@ -101,6 +111,16 @@ def test_comp2vec_single():
     npt.assert_almost_equal(returned_wdir, correct_wdir)
     npt.assert_almost_equal(returned_wspd, correct_wspd)
 
+def test_comp2vec_single_matches_array():
+    input_u = [0, -5, 5, 0, 3.3, -7.1, 10]
+    input_v = [5, 0, 0, -5, -2.2, 4.4, 10]
+    correct_wdir, correct_wspd = utils.comp2vec(input_u, input_v)
+    for i in range(len(input_u)):
+        returned_wdir, returned_wspd = utils.comp2vec(input_u[i], input_v[i])
+        npt.assert_(isinstance(returned_wdir, float))
+        npt.assert_almost_equal(returned_wdir, correct_wdir[i])
+        npt.assert_almost_equal(returned_wspd, correct_wspd[i])
+
 def test_comp2vec_array():
     input_u = [0, -7.0710678118654746, -15, -14.142135623730951, 0,
         21.213203435596423, 35, 28.284271247461909, 0]
@@ -235,3 +255,64 @@ def test_mag_user_missing_array():
     correct_answer[correct_answer == missing] = ma.masked
     returned_answer = utils.mag(input_u, input_v, missing)
     npt.assert_almost_equal(returned_answer, correct_answer)
+
+
+def test_nan_mode_matches_masked():
+    input_wdir = np.asarray([0., 90., 225., np.nan, 330., MISSING])
+    input_wspd = np.asarray([10., 20., np.nan, 15., 0., 10.])
+    input_wdir[-1] = np.nan
+    wdir = np.where(np.isnan(input_wdir), MISSING, input_wdir)
+    wspd = np.where(np.isnan(input_wspd), MISSING, input_wspd)
+    returned_u, returned_v = utils.vec2comp(input_wdir, input_wspd,
+                                            missing=np.nan)
+    npt.assert_(type(returned_u) is np.ndarray)
+    correct_u, correct_v = utils.vec2comp(wdir, wspd)
+    npt.assert_almost_equal(returned_u, ma.filled(correct_u, np.nan))
+    npt.assert_almost_equal(returned_v, ma.filled(correct_v, np.nan))
+
+    returned_wdir, returned_wspd = utils.comp2vec(returned_u, returned_v,
+                                                  missing=np.nan)
+    correct_wdir, correct_wspd = utils.comp2vec(correct_u, correct_v)
+    npt.assert_(type(returned_wdir) is np.ndarray)
+    npt.assert_almost_equal(returned_wdir, ma.filled(correct_wdir, np.nan))
+    npt.assert_almost_equal(returned_wspd, ma.filled(correct_wspd, np.nan))
+    returned_mag = utils.mag(returned_u, returned_v, missing=np.nan)
+    npt.assert_almost_equal(returned_mag, returned_wspd)
+
+    returned_u, returned_v = utils.vec2comp(np.float64(225.), 10.,
+                                            missing=np.nan)
+    npt.assert_almost_equal([returned_u, returned_v],
+                            utils.vec2comp(225., 10.))
+
+    # broadcast pass: scalar direction with an array of speeds
+    input_wspd = np.asarray([[10., 20.], [np.nan, 0.]])
+    returned_u, returned_v = utils.vec2comp(225., input_wspd, missing=np.nan)
+    correct_u, correct_v = utils.vec2comp(np.full((2, 2), 225.),
+                                          input_wspd, missing=np.nan)
+    npt.assert_equal(returned_u.shape, (2, 2))
+    npt.assert_almost_equal(returned_u, correct_u)
+    npt.assert_almost_equal(returned_v, correct_v)
+    npt.assert_almost_equal([returned_u[0, 1], returned_v[0, 1]],
+                            utils.vec2comp(225., 20.))
+    returned_u, returned_v = utils.vec2comp(np.asarray([0., 90.]), 10.,
+                                            missing=np.nan)
+    npt.assert_almost_equal(returned_u, [0., -10.])
+    npt.assert_almost_equal(returned_v, [-10., 0.])
+
+    # 0-d arrays and float32 scalars take the array path
+    for cast in (np.asarray, np.float32):
+        returned_u, returned_v = utils.vec2comp(cast(90.), cast(2.),
+                                                missing=np.nan)
+        npt.assert_almost_equal([returned_u, returned_v],
+                                utils.vec2comp(90., 2.), decimal=5)
+        npt.assert_equal(np.ndim(returned_u), 0)
+        returned_wdir, returned_wspd = utils.comp2vec(cast(1.), cast(2.),
+                                                      missing=np.nan)
+        npt.assert_almost_equal([returned_wdir, returned_wspd],
+                                utils.comp2vec(1., 2.), decimal=5)
+        npt.assert_equal(np.ndim(returned_wdir), 0)
+        npt.assert_almost_equal(utils.mag(cast(3.), cast(4.),
+                                          missing=np.nan), 5.)
+    returned_u, returned_v = utils.vec2comp(np.asarray(np.nan), 2.,
+                                            missing=np.nan)
+    npt.assert_(np.isnan(returned_u) and np.isnan(returned_v))
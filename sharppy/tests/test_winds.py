@@ -4,6 +4,7 @@ import numpy.testing as npt
 import sharppy.sharptab.winds as winds
 import sharppy.sharptab.utils as utils
 import sharppy.sharptab.interp as interp
+from sharppy.sharptab.constants import MISSING
 from sharppy.sharptab.profile import Profile
 import test_profile
 
@@ -17,12 +18,29 @@ def test_mean_wind():
     correct_u, correct_v = 27.347100616691097, 1.7088123127933754
     npt.assert_almost_equal(returned, [correct_u, correct_v])
 
+    returned = winds.mean_wind(prof, exact=True)
+    correct_u, correct_v = 27.38084061629449, 1.691848158687713
+    npt.assert_almost_equal(returned, [correct_u, correct_v])
+    npt.assert_almost_equal(returned, winds.mean_wind(prof, dp=-0.01),
+                            decimal=3)
+
+    # layers that extend outside of the data are undefined
+    npt.assert_(np.all(np.isnan(winds.mean_wind(prof, 1100., 1050.))))
+
 
 def test_mean_wind_npw():
     returned = winds.mean_wind_npw(prof)
     correct_u, correct_v = 31.831128476043443, -0.40994804851302158
     npt.assert_almost_equal(returned, [correct_u, correct_v])
 
+    returned = winds.mean_wind_npw(prof, exact=True)
+    correct_u, correct_v = 31.843605953676942, -0.41460323813427524
+    npt.assert_almost_equal(returned, [correct_u, correct_v])
+    npt.assert_almost_equal(returned, winds.mean_wind_npw(prof, dp=-0.01),
+                            decimal=3)
+
+    npt.assert_(np.all(np.isnan(winds.mean_wind_npw(prof, 1100., 1050.))))
+
 
 def test_sr_wind():
     input_stu = 10
@@ -52,9 +70,26 @@ def test_wind_shear():
     npt.assert_almost_equal(returned, [correct_u, correct_v])
 
 
+def test_wind_shear_layers():
+    layers = [(1000., 3000.), (0., 6000.), (0., 50000.)]
+    returned = winds.wind_shear_layers(prof, layers, agl=True)
+    for i, (agl1, agl2) in enumerate(layers[:-1]):
+        pbot = interp.pres(prof, interp.to_msl(prof, agl1))
+        ptop = interp.pres(prof, interp.to_msl(prof, agl2))
+        correct = winds.wind_shear(prof, pbot, ptop)
+        npt.assert_almost_equal([r[i] for r in returned], correct)
+    npt.assert_(np.isnan(returned[0][-1]))
+
+    layers = [(850., 250.), (900., 500.)]
+    returned = winds.wind_shear_layers(prof, layers)
+    for i, (pbot, ptop) in enumerate(layers):
+        correct = winds.wind_shear(prof, pbot, ptop)
+        npt.assert_almost_equal([r[i] for r in returned], correct)
+
+
 def test_non_parcel_bunkers_motion():
-    correct = [10.532915762684453, -7.863859696750608,
-               20.924864405622614, 19.379065415942257]
+    correct = [10.515820460950192, -7.8496085087420004,
+               20.907769103888352, 19.393316603950865]
     returned = winds.non_parcel_bunkers_motion(prof)
     npt.assert_almost_equal(returned, correct)
 
@@ -75,6 +110,44 @@ def test_helicity():
     npt.assert_almost_equal(returned, correct)
 
 
+def test_helicity_layers():
+    layers = [(0., 3000.), (0., 500.), (0., 1000.), (1000., 6000.),
+              (0., 50000.)]
+    input_ru = np.asarray([10.5329157627, 0., 15.])
+    input_rv = np.asarray([-7.86385969675, 0., -3.])
+    returned = winds.helicity_layers(prof, layers, stu=input_ru,
+                                     stv=input_rv)
+    correct = [284.9218078420389, 302.9305759626597, -18.008768120620786]
+    npt.assert_almost_equal([r[0, 0] for r in returned], correct)
+    for i, (stu, stv) in enumerate(zip(input_ru, input_rv)):
+        for j, (agl1, agl2) in enumerate(layers[:-1]):
+            correct = winds.helicity(prof, agl1, agl2, stu=stu, stv=stv,
+                                     exact=True)
+            npt.assert_almost_equal([r[i, j] for r in returned], correct)
+    npt.assert_(np.all(np.isnan(returned[0][:, -1])))
+
+    returned = winds.helicity_layers(prof, layers[:2], stu=10., stv=5.)
+    npt.assert_equal(returned[0].shape, (2,))
+
+
+def test_srh_map():
+    input_stu, input_stv = np.meshgrid(np.linspace(-20., 40., 7),
+                                       np.linspace(-30., 30., 5))
+    returned = winds.srh_map(prof, 0., 3000., input_stu, input_stv)
+    returned_parts = winds.srh_map(prof, 0., 3000., input_stu, input_stv,
+                                   parts=True)
+    npt.assert_equal(returned.shape, input_stu.shape)
+    npt.assert_almost_equal(returned_parts[0], returned)
+    for (i, j), stu in np.ndenumerate(input_stu):
+        correct = winds.helicity(prof, 0., 3000., stu=stu,
+                                 stv=input_stv[i, j], exact=True)
+        npt.assert_almost_equal(returned[i, j], correct[0])
+        npt.assert_almost_equal([r[i, j] for r in returned_parts], correct)
+
+    returned = winds.srh_map(prof, 0., 50000., input_stu, input_stv)
+    npt.assert_(np.all(np.isnan(returned)))
+
+
 def test_max_wind():
     agl1 = 0.
     agl2 = 30000
@@ -90,16 +163,57 @@ def test_max_wind():
     npt.assert_almost_equal(returned, correct)
 
 
+def test_max_wind_layers():
+    layers = [(0., 3000.), (3000., 12000.), (0., 30000.), (500., 600.),
+              (0., 50000.)]
+    returned = winds.max_wind_layers(prof, layers)
+    for i, (agl1, agl2) in enumerate(layers[:-1]):
+        correct = winds.max_wind(prof, agl1, agl2)
+        npt.assert_almost_equal([r[i] for r in returned], correct)
+    npt.assert_(np.all(np.isnan([r[-1] for r in returned])))
+
+    # missing pressures below a layer must not shift its levels
+    input_p = test_profile.pres.copy()
+    input_p[[10, 20, 30]] = MISSING
+    with np.errstate(invalid='ignore'):
+        gappy = Profile(pres=input_p, hght=test_profile.hght,
+                        tmpc=test_profile.tmpc, dwpc=test_profile.dwpc,
+                        wdir=test_profile.wdir, wspd=test_profile.wspd)
+    layers = [(1000., 9000.), (0., 3000.), (3000., 12000.)]
+    returned = winds.max_wind_layers(gappy, layers)
+    for i, (agl1, agl2) in enumerate(layers):
+        correct = winds.max_wind(gappy, agl1, agl2)
+        npt.assert_almost_equal([r[i] for r in returned], correct)
+
+
 def test_corfidi_mcs_motion():
-    correct = [34.597990416506541, -17.61022875300797,
-               64.319470111830171, -16.945587838431905]
+    correct = [34.66666688089366, -17.679107930301637,
+               64.39962288009907, -17.022560624793304]
     returned = winds.corfidi_mcs_motion(prof)
     npt.assert_almost_equal(returned, correct)
 
 
+def test_kinematics():
+    returned = winds.kinematics(prof)
+    npt.assert_almost_equal(returned['bunkers'],
+                            winds.non_parcel_bunkers_motion(prof))
+    npt.assert_almost_equal(returned['corfidi'],
+                            winds.corfidi_mcs_motion(prof))
+    psfc = prof.pres[prof.sfc]
+    for h, name in ((1000., '1km'), (3000., '3km'), (6000., '6km')):
+        ptop = interp.pres(prof, interp.to_msl(prof, h))
+        npt.assert_almost_equal(returned['sfc_%s_shear' % name],
+                                winds.wind_shear(prof, psfc, ptop))
+    p1500m = interp.pres(prof, interp.to_msl(prof, 1500.))
+    npt.assert_almost_equal(returned['sfc_1500m_mean'],
+        winds.mean_wind_npw(prof, psfc, p1500m, exact=True))
+    npt.assert_almost_equal(returned['850_300mb_mean'],
+        winds.mean_wind_npw(prof, 850., 300., exact=True))
+
+
 def test_mbe_vectors():
-    correct = [34.597990416506541, -17.61022875300797,
-               64.319470111830171, -16.945587838431905]
+    correct = [34.66666688089366, -17.679107930301637,
+               64.39962288009907, -17.022560624793304]
     returned = winds.mbe_vectors(prof)
     npt.assert_almost_equal(returned, correct)
 